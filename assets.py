@@ -0,0 +1,105 @@
+"""Asset packs: the frames cut from each spritesheet, cached as raw pixels.
+
+Decoding a spritesheet PNG costs far more than the frames the game uses
+from it (terrain.png is 1024x1024 for two 32x32 tiles). So the frames a
+Spritesheet hands out are saved to a pack in ASSET_CACHE_DIR, and the next
+start reads them from there instead, while the PNG decodes on a background
+thread in case a frame outside the pack is needed. A pack is used only while
+its source PNG is unchanged: same mtime and size, or failing that the same
+content hash. Layout (little-endian):
+
+    header  HEADER
+    index   one FRAME per frame
+    pixels  width * height RGB bytes per frame, in index order
+"""
+import hashlib, mmap, os, struct
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+from settings import *
+
+MAGIC = b'RPGA'
+VERSION = 1
+HEADER = struct.Struct('<4sHQQ16sI')  # magic, version, source mtime (ns), source size, source hash, frames
+FRAME = struct.Struct('<HHHH?BBB')  # x, y, width, height, has colorkey, colorkey RGB
+
+def make_loader():
+    # PNG decoding releases the GIL, so sheets decode while the game sets up
+    global loader
+    loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix='assets')
+
+make_loader()
+os.register_at_fork(after_in_child=make_loader)  # Worker processes (batch.py) don't inherit the threads
+
+def load_image(path):
+    """Starts decoding an image on the loader thread; returns a Future of the (unconverted) Surface."""
+    return loader.submit(pygame.image.load, path)
+
+def pack_path(path):
+    return os.path.join(ASSET_CACHE_DIR, os.path.basename(path) + '.pack')
+
+def source_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+def read_pack(path):
+    """The cached frames of the spritesheet at `path`, keyed like Spritesheet.frames; {} if there is no valid pack."""
+    try:
+        source = os.stat(path)
+        with open(pack_path(path), 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # No pack yet (ValueError: empty file)
+        return {}
+
+    with data:
+        try:
+            return parse_pack(path, source, data)
+        except (struct.error, ValueError):  # Truncated or corrupt; it is rewritten after the PNG decodes
+            return {}
+
+def parse_pack(path, source, data):
+    magic, version, mtime, size, digest, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        return {}
+    if (mtime, size) != (source.st_mtime_ns, source.st_size) and digest != source_hash(path):
+        return {}  # Source changed; a fresh checkout that only touched mtimes still matches the hash
+
+    index = [FRAME.unpack_from(data, HEADER.size + FRAME.size * i) for i in range(count)]
+    if HEADER.size + FRAME.size * count + sum(width * height * 3 for _, _, width, height, *_ in index) != len(data):
+        return {}  # Cut short by a crash mid-write, or has trailing bytes
+
+    frames = {}
+    offset = HEADER.size + FRAME.size * count
+    for x, y, width, height, keyed, *colorkey in index:
+        length = width * height * 3
+        # frombuffer shares the mapped bytes; convert() copies them into the display format
+        frame = pygame.image.frombuffer(data[offset:offset + length], (width, height), 'RGB').convert()
+        offset += length
+        colorkey = tuple(colorkey) if keyed else None
+        if colorkey is not None:
+            frame.set_colorkey(colorkey, pygame.RLEACCEL)
+        frames[(x, y, width, height, colorkey)] = frame
+    return frames
+
+def write_pack(path, frames):
+    """Saves Spritesheet.frames for the sheet at `path`. The cache is optional, so failures are ignored."""
+    source = os.stat(path)
+    index, pixels = [], []
+    for (x, y, width, height, colorkey), frame in frames.items():
+        index.append(FRAME.pack(x, y, width, height, colorkey is not None, *(colorkey or (0, 0, 0))))
+        pixels.append(pygame.image.tobytes(frame, 'RGB'))
+    header = HEADER.pack(MAGIC, VERSION, source.st_mtime_ns, source.st_size, source_hash(path), len(frames))
+
+    target = pack_path(path)
+    temporary = f"{target}.{os.getpid()}"  # Parallel batch runs may write the same pack
+    try:
+        os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+        with open(temporary, 'wb') as f:
+            f.write(header + b''.join(index) + b''.join(pixels))
+            f.flush()
+            os.fsync(f.fileno())  # On disk before the rename, so a crash can't leave a short pack behind
+        os.replace(temporary, target)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
@@ -0,0 +1,139 @@
+"""Headless batch runner: many independent game worlds across all cores.
+
+Each run is a job with its own seed, map and enemy parameters. Jobs are
+spread over a process pool and each result is written as one compact JSON
+line as soon as its run finishes, so a long batch can be watched (or cut
+short) without losing finished runs.
+
+    python batch.py --runs 1000 --map 64 64 100 --param stall_steps 60 120 --output results.jsonl
+    python batch.py --jobs jobs.jsonl --output results.jsonl --workers 16
+
+With --jobs, every line is a job object; missing keys take the defaults below:
+
+    {"seed": 7, "map": [64, 64, 100], "map_seed": 7, "params": {"steps": 60}, "ticks": 600}
+
+"map" is [cols, rows, enemies] for a generated map, or null for WORLD_MAP.
+"params" overrides entries of ENEMY_PARAMS (settings.py).
+"""
+import argparse, itertools, json, sys, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from settings import *
+from controls import ScriptedInput
+from tilemap import generate_world_map
+from benchmark import random_walk
+from main import Game
+
+JOB_DEFAULTS = {
+    'seed': 1,
+    'map': None,
+    'map_seed': None,  # Defaults to the run seed
+    'params': {},
+    'ticks': 600,
+    'vectorized': False,
+    'render': False,  # Also draw every tick (to the dummy display), for soak tests of the renderer
+}
+
+@lru_cache(maxsize=16)
+def world_map(spec, seed):
+    """Generated maps are reused by later jobs in the same worker that ask for the same one."""
+    if spec is None:
+        return WORLD_MAP
+    return generate_world_map(*spec, seed)
+
+def run_job(job):
+    """Runs one game for job['ticks'] ticks and returns its metrics. Runs in a worker process."""
+    spec = tuple(job['map']) if job['map'] else None
+    map_seed = job['seed'] if job['map_seed'] is None else job['map_seed']
+    start = time.perf_counter()
+    game = Game(headless=True, seed=job['seed'], input_source=ScriptedInput(random_walk(job['ticks'], job['seed'])),
+                world_map=world_map(spec, map_seed), vectorized_enemies=job['vectorized'], enemy_params=job['params'])
+    setup = time.perf_counter() - start
+
+    contact_ticks = 0  # Ticks on which an enemy touched the player
+    start = time.perf_counter()
+    for _ in range(job['ticks']):
+        game.update(TICK)
+        if job['render']:
+            game.render()
+        if game.enemy_rects(game.player.rect):
+            contact_ticks += 1
+    elapsed = time.perf_counter() - start
+
+    if game.enemy_system:
+        enemies = len(game.enemy_system)
+    else:
+        enemies = len(game.enemies)
+    return {
+        'id': job['id'],
+        'seed': job['seed'],
+        'map': job['map'],
+        'params': job['params'],
+        'ticks': job['ticks'],
+        'setup_s': round(setup, 4),
+        'run_s': round(elapsed, 4),
+        'ticks_per_s': round(job['ticks'] / elapsed, 1),
+        'enemies': enemies,
+        'contact_ticks': contact_ticks,
+        'player': list(game.player.rect.topleft),
+    }
+
+def make_jobs(args):
+    """Every combination of --param values, each run --runs times with consecutive seeds."""
+    names = [name for name, *_ in args.param]
+    values = [[json.loads(value) for value in values] for _, *values in args.param]
+    jobs = []
+    for combination in itertools.product(*values):
+        for seed in range(args.seed, args.seed + args.runs):
+            jobs.append({'seed': seed, 'map': args.map, 'params': dict(zip(names, combination)),
+                         'ticks': args.ticks, 'vectorized': args.vectorized})
+    return jobs
+
+def read_jobs(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def run_batch(jobs, output, workers=None):
+    """Runs `jobs` on `workers` processes, appending each result to the `output` file as it finishes."""
+    jobs = [{**JOB_DEFAULTS, 'id': i, **job} for i, job in enumerate(jobs)]
+    unknown = {key for job in jobs for key in job} - set(JOB_DEFAULTS) - {'id'}
+    if unknown:
+        raise ValueError(f"unknown job keys: {', '.join(sorted(unknown))}")
+
+    start = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(output, 'w') as f:
+        futures = {pool.submit(run_job, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception as error:  # One bad parameter set shouldn't end the batch
+                result = {'id': futures[future]['id'], 'error': repr(error)}
+                failed += 1
+            f.write(json.dumps(result, separators=(',', ':')) + '\n')
+            f.flush()
+            print(f"\r{done}/{len(jobs)} runs", end='', file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    ticks = sum(job['ticks'] for job in jobs)
+    print(f"\n{len(jobs)} runs ({failed} failed) in {elapsed:.1f} s, {ticks / elapsed:.0f} ticks/s overall", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', help="JSON-lines file of jobs (otherwise a sweep is built from the options below)")
+    parser.add_argument('--runs', type=int, default=8, help="seeds per parameter combination")
+    parser.add_argument('--seed', type=int, default=1, help="first seed")
+    parser.add_argument('--map', nargs=3, type=int, metavar=('COLS', 'ROWS', 'ENEMIES'), help="generated map (default WORLD_MAP)")
+    parser.add_argument('--param', nargs='+', action='append', default=[], metavar=('NAME', 'VALUE'),
+                        help="enemy parameter and the JSON values to sweep, e.g. --param number_steps '[30, 60]' '[90]'")
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--vectorized', action='store_true', help="use the NumPy enemy system")
+    parser.add_argument('--workers', type=int, help="processes (default: one per core)")
+    parser.add_argument('--output', default='results.jsonl')
+    args = parser.parse_args()
+
+    jobs = read_jobs(args.jobs) if args.jobs else make_jobs(args)
+    run_batch(jobs, args.output, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Headless frame-time benchmarks.
+
+Runs the game without a window on generated maps of increasing size and
+enemy count, with seeded enemies, scripted input and a fixed dt, and prints
+(or writes) JSON with p50/p95/p99 time per phase, mean per-frame profiler
+counters and peak memory per scenario.
+
+    python benchmark.py --frames 300 --output bench.json
+
+--memory compares what one enemy costs as a slotted Enemy (entities.py) and
+as the plain Sprite subclass it used to be:
+
+    python benchmark.py --memory 100000
+"""
+import argparse, gc, json, platform, random, resource, statistics, sys, time, tracemalloc
+import pygame
+from settings import *
+from controls import *
+from tilemap import generate_world_map
+from profiler import profiler
+from entities import DOWN
+from sprites import Enemy
+from main import Game
+
+# (map columns, map rows, enemies)
+SCENARIOS = [
+    (58, 23, 10),
+    (64, 64, 100),
+    (128, 128, 1000),
+    (256, 256, 10000),
+]
+
+# Profiler scopes whose time is reported as the collision phase: the player's collisions and
+# every enemy's wall collisions, batched in the enemy system or summed over sprite enemies
+COLLISION_SCOPES = ('collide_block', 'collide_enemy')
+
+def random_walk(ticks, seed):
+    """Input states that hold a random direction (or nothing) for 10-60 ticks at a time."""
+    rng = random.Random(seed)
+    states = []
+    while len(states) < ticks:
+        states += [rng.choice([0, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN])] * rng.randint(10, 60)
+    return states[:ticks]
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {'p50_ms': cuts[49] * 1000, 'p95_ms': cuts[94] * 1000, 'p99_ms': cuts[98] * 1000}
+
+def make_game(world_map, frames, seed, vectorized, lod=LOD_ENABLED):
+    return Game(headless=True, seed=seed, input_source=ScriptedInput(random_walk(frames, seed)), world_map=world_map,
+                vectorized_enemies=vectorized, lod=lod)
+
+def run_scenario(cols, rows, enemies, frames, seed, vectorized=False, lod=LOD_ENABLED):
+    world_map = generate_world_map(cols, rows, enemies, seed)
+    dt = TICK
+
+    start = time.perf_counter()
+    game = make_game(world_map, frames, seed, vectorized, lod)
+    setup = time.perf_counter() - start
+
+    samples = {'update': [], 'collision': [], 'history': [], 'draw': [], 'frame': []}
+    counters = {}
+    profiler.enabled = True
+    try:
+        for _ in range(frames):
+            game.run_frames(1, dt)
+            frame = profiler.frames[-1]
+            collision = sum(frame.totals[name][0] for name in COLLISION_SCOPES if name in frame.totals)
+
+            samples['update'].append(frame.totals['update'][0] - collision)  # Excluding collision
+            samples['collision'].append(collision)
+            samples['history'].append(frame.totals['history'][0] if 'history' in frame.totals else 0.0)  # Rewind snapshots
+            samples['draw'].append(frame.totals['draw'][0])
+            samples['frame'].append(frame.duration)
+            for name, value in frame.counters.items():
+                counters[name] = counters.get(name, 0) + value
+    finally:
+        profiler.enabled = PROFILER_ENABLED
+    navigation = game.navigation.stats() if game.navigation else None  # Flow-field rebuild cost
+
+    # Separate short run for memory, since tracing would distort the timings above
+    tracemalloc.start()
+    game = make_game(world_map, frames, seed, vectorized, lod)
+    game.run_frames(min(frames, 10), dt)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'map': [cols, rows],
+        'enemies': enemies,
+        'vectorized': vectorized,
+        'lod': lod,
+        'frames': frames,
+        'setup_s': setup,
+        'phases': {phase: percentiles(values) for phase, values in samples.items()},
+        'counters': {name: value / frames for name, value in counters.items()},  # Mean per frame
+        'navigation': navigation,
+        'peak_python_bytes': peak,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+class SpriteEnemy(pygame.sprite.Sprite):
+    """Baseline for entity_memory(): an enemy as a Sprite subclass, with the game, frames and
+    parameters in every instance's __dict__ and string directions and states."""
+    def __init__(self, game, x, y):
+        self._layer = ENEMY_LAYER
+        super().__init__(game.all_sprites, game.enemies)
+        kind = game.enemy_kind
+        self.width = TILESIZE
+        self.height = TILESIZE
+        self.game = game
+        self.spawn_order = game.enemies_spawned
+        game.enemies_spawned += 1
+        self.updated_tick = game.tick
+        self.image = kind.frames[DOWN][0]
+        self.rect = self.image.get_rect(topleft=(x * TILESIZE, y * TILESIZE))
+        self.previous_pos = self.rect.topleft
+        game.spatial.insert(self)
+        self.x_change = 0
+        self.y_change = 0
+        self.animation_counter = 1
+        self.direction = game.rng.choice(ENEMY_DIRECTIONS)
+        self.state = 'moving'
+        self.speed = kind.speed
+        self.number_steps = game.rng.choice(kind.number_steps)
+        self.stall_steps = kind.stall_steps
+        self.current_steps = 0
+        self.collision_reacting_steps = kind.collision_reacting_steps
+        self.collision_reaction_counter = 0
+        self.moving = False
+        self.health = kind.health
+        self.animations = game.enemy_spritesheet.get_animations()
+
+def instance_bytes(entity):
+    """The entity object itself, its __dict__ if any, and the container of its groups."""
+    size = sys.getsizeof(entity) + sys.getsizeof(getattr(entity, '_Sprite__g', getattr(entity, '_groups', ())))
+    if hasattr(entity, '__dict__'):
+        size += sys.getsizeof(entity.__dict__)
+    return size
+
+def entity_memory(count, seed):
+    """Bytes per enemy with `count` of them, for Enemy and SpriteEnemy. The total covers everything
+    creating them allocates (rects, group and spatial-hash entries), the instance just the object."""
+    results = {'entities': count}
+    cols = max(1, int(count ** 0.5))
+    for name, cls in (('slotted', Enemy), ('sprite', SpriteEnemy)):
+        game = Game(headless=True, seed=seed, world_map=generate_world_map(16, 16, 0, seed), lod=False)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            cls(game, i % cols, i // cols)
+        total = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        results[name] = {'total_bytes': total / count, 'instance_bytes': instance_bytes(next(iter(game.enemies)))}
+    results['ratio'] = results['sprite']['total_bytes'] / results['slotted']['total_bytes']
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-enemies', type=int, default=10000, help="skip scenarios with more enemies")
+    parser.add_argument('--vectorized', action='store_true', help="use the NumPy enemy system")
+    parser.add_argument('--no-lod', action='store_true', help="update every sprite enemy every tick")
+    parser.add_argument('--memory', type=int, metavar='ENTITIES', help="only compare per-enemy memory at this many enemies")
+    parser.add_argument('--label', default='', help="free-form version label stored with the results")
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.memory:
+        json.dump(entity_memory(args.memory, args.seed), sys.stdout, indent=2)
+        print()
+        return
+
+    results = {
+        'label': args.label,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'seed': args.seed,
+        'scenarios': [],
+    }
+    for cols, rows, enemies in SCENARIOS:
+        if enemies > args.max_enemies:
+            continue
+        result = run_scenario(cols, rows, enemies, args.frames, args.seed, args.vectorized, not args.no_lod)
+        results['scenarios'].append(result)
+        frame = result['phases']['frame']
+        print(f"{cols}x{rows}, {enemies} enemies: p50 {frame['p50_ms']:.2f} ms, p99 {frame['p99_ms']:.2f} ms", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
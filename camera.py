@@ -0,0 +1,30 @@
+import pygame
+
+def interpolate(sprite, alpha):
+    """World rect of a sprite `alpha` of the way from its previous tick's position to its current one."""
+    previous = getattr(sprite, 'previous_pos', None)
+    rect = sprite.rect
+    if previous is None or alpha >= 1:
+        return rect
+    x, y = previous
+    return pygame.Rect(round(x + (rect.x - x) * alpha), round(y + (rect.y - y) * alpha), rect.width, rect.height)
+
+class Camera:
+    """Viewport onto the world that follows a target and culls what is off screen."""
+    def __init__(self, width, height, world_width, world_height):
+        self.rect = pygame.Rect(0, 0, width, height)  # Visible area in world coordinates
+        self.world_rect = pygame.Rect(0, 0, world_width, world_height)
+
+    @property
+    def offset(self):
+        return (-self.rect.x, -self.rect.y)
+
+    def follow(self, target, alpha=1.0):
+        """Centres on the target as drawn, `alpha` of the way from its previous position to its current one."""
+        rect = interpolate(target, alpha)
+        self.rect.center = rect.center
+        self.rect.clamp_ip(self.world_rect)  # Don't show past the map edges (centres small maps)
+
+    def apply(self, rect):
+        """Converts a world rect to screen coordinates."""
+        return rect.move(-self.rect.x, -self.rect.y)
@@ -0,0 +1,144 @@
+"""Determinism checks, runnable after any change to the simulation.
+
+Later features rely on three properties that nothing else tests:
+
+    lockstep   sprite enemies and the vectorized enemy system (VECTORIZED_ENEMIES)
+               stay tick-identical, shots and hits included
+    snapshot   save, restore and rewind give back exactly the saved state, and
+               the simulation continues from it as if it had never stopped
+    replay     an input log replays without diverging, and a changed input does diverge
+
+    python check.py
+
+Prints one line per check and exits with an error if any fails.
+"""
+import argparse, os, sys, tempfile
+import snapshot, replay
+from settings import *
+from controls import *
+from tilemap import generate_world_map
+from benchmark import random_walk
+from main import Game
+
+class CheckFailed(Exception):
+    pass
+
+def script(ticks, seed):
+    """A random walk that fires in alternating 20-tick bursts."""
+    return [state | (INPUT_FIRE if tick // 20 % 2 else 0) for tick, state in enumerate(random_walk(ticks, seed))]
+
+def make_game(world_map, states, vectorized, **options):
+    return Game(headless=True, seed=9, input_source=ScriptedInput(states), world_map=world_map,
+                vectorized_enemies=vectorized, **options)
+
+def frame_of(enemy):
+    """(direction, frame) codes of a sprite enemy's current image, as the enemy system stores them."""
+    for direction, frames in enumerate(enemy.kind.frames):
+        for index, frame in enumerate(frames):
+            if frame is enemy.image:
+                return direction, index
+
+def check_lockstep(ticks):
+    world_map = generate_world_map(40, 30, 300, 7)
+    states = script(ticks, 4)
+    sprites = make_game(world_map, states, False, lod=False)  # The LOD scheduler updates far enemies less often
+    vectorized = make_game(world_map, states, True)
+    enemies = sorted(sprites.enemies, key=lambda enemy: enemy.spawn_order)
+    for _ in range(ticks):
+        sprites.update(TICK)
+        vectorized.update(TICK)
+        expected = [
+            (enemy.rect.x, enemy.rect.y, enemy.direction, enemy.state, enemy.current_steps,
+             enemy.animation_counter, enemy.health, frame_of(enemy))
+            for enemy in enemies if enemy.alive()
+        ]
+        system = vectorized.enemy_system
+        actual = [
+            (int(system.x[i]), int(system.y[i]), int(system.direction[i]), int(system.state[i]), int(system.current_steps[i]),
+             float(system.animation_counter[i]), int(system.health[i]), (int(system.frame_direction[i]), int(system.frame[i])))
+            for i in range(len(system))
+        ]
+        if actual != expected:
+            raise CheckFailed(f"enemies differ on tick {sprites.tick}")
+        if sprites.player.rect != vectorized.player.rect or len(sprites.projectiles) != len(vectorized.projectiles):
+            raise CheckFailed(f"player or projectiles differ on tick {sprites.tick}")
+    return f"{ticks} ticks, {len(sprites.enemies)} of {len(enemies)} enemies left"
+
+def check_snapshot(ticks):
+    world_map = generate_world_map(48, 48, 300, 2)
+    states = script(3 * ticks, 5)
+    for vectorized in (False, True):
+        mode = 'vectorized' if vectorized else 'sprites'
+        game = make_game(world_map, states, vectorized)
+        for _ in range(ticks):
+            game.update(TICK)
+        saved = snapshot.save(game)
+        saves = {}  # Tick -> snapshot, to compare rewinds with
+        for _ in range(ticks):
+            game.update(TICK)
+            game.history.record()
+            saves[game.tick] = snapshot.save(game)
+        end = snapshot.save(game)
+
+        while game.history.rewind():
+            if snapshot.save(game) != saves[game.tick]:
+                raise CheckFailed(f"{mode}: rewinding to tick {game.tick} differs from its save")
+        snapshot.restore(game, saved)
+        if snapshot.save(game) != saved:
+            raise CheckFailed(f"{mode}: restoring in place differs from the save")
+
+        fresh = make_game(world_map, states, vectorized)
+        snapshot.restore(fresh, saved)
+        for restored in (game, fresh):
+            restored.input.tick = ticks  # Resume the script where the save was made
+            for _ in range(ticks):
+                restored.update(TICK)
+            if snapshot.save(restored) != end:
+                which = 'in place' if restored is game else 'into a new game'
+                raise CheckFailed(f"{mode}: continuing after restoring {which} ends in a different state")
+    return f"save, rewind and {ticks} ticks on from a restore, both enemy modes"
+
+def check_replay(ticks):
+    for vectorized in (False, True):
+        mode = 'vectorized' if vectorized else 'sprites'
+        game = Game(headless=True, seed=3, input_source=ScriptedInput(script(ticks, 6)), vectorized_enemies=vectorized)
+        recorder = game.record()
+        for _ in range(ticks):
+            game.update(TICK)
+            recorder.record()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'check.rpgr')
+            recorder.save(path)
+            log = replay.read_log(path)
+        result = replay.replay(log, render=False)
+        if result['diverged_at'] is not None:
+            raise CheckFailed(f"{mode}: replay diverged at tick {result['diverged_at']}")
+        states = bytearray(log['states'])
+        states[ticks // 2:ticks // 2 + 60] = bytes([INPUT_LEFT] * 30 + [INPUT_RIGHT] * 30)  # Moves the player even against a wall
+        log['states'] = bytes(states)
+        if replay.replay(log, render=False)['diverged_at'] is None:
+            raise CheckFailed(f"{mode}: replay with a changed input did not diverge")
+    return f"{ticks} recorded ticks, both enemy modes"
+
+CHECKS = {'lockstep': check_lockstep, 'snapshot': check_snapshot, 'replay': check_replay}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=2 * REPLAY_CHECKPOINT, help="ticks per check")
+    parser.add_argument('checks', nargs='*', metavar='CHECK', help=f"run only these ({', '.join(CHECKS)})")
+    args = parser.parse_args()
+    unknown = set(args.checks) - set(CHECKS)
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(sorted(unknown))}")
+
+    failed = 0
+    for name in args.checks or CHECKS:
+        try:
+            print(f"{name}: ok ({CHECKS[name](args.ticks)})")
+        except CheckFailed as error:
+            print(f"{name}: FAILED ({error})")
+            failed += 1
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import pygame
+
+# Input state is a bitmask of the held controls, read once per tick
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_FIRE = 16
+
+class KeyboardInput:
+    """Reads the live keyboard (arrows or WASD to move, space to fire)."""
+    def read(self):
+        pressed = pygame.key.get_pressed()  # Get current state of all keys
+        state = 0
+        if pressed[pygame.K_LEFT] or pressed[pygame.K_a]:
+            state |= INPUT_LEFT
+        if pressed[pygame.K_RIGHT] or pressed[pygame.K_d]:
+            state |= INPUT_RIGHT
+        if pressed[pygame.K_UP] or pressed[pygame.K_w]:
+            state |= INPUT_UP
+        if pressed[pygame.K_DOWN] or pressed[pygame.K_s]:
+            state |= INPUT_DOWN
+        if pressed[pygame.K_SPACE]:
+            state |= INPUT_FIRE
+        return state
+
+class ScriptedInput:
+    """Plays back a fixed sequence of input states, then holds nothing."""
+    def __init__(self, states):
+        self.states = list(states)
+        self.tick = 0
+
+    def read(self):
+        state = self.states[self.tick] if self.tick < len(self.states) else 0
+        self.tick += 1
+        return state
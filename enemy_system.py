@@ -0,0 +1,236 @@
+import numpy as np
+import pygame
+from settings import *
+from profiler import profiler
+from entities import LEFT, RIGHT, UP, DOWN, MOVING, STALLING, COLLISION_REACTING  # Same codes as sprite enemies
+
+DIRECTIONS = ENEMY_DIRECTIONS  # Direction names by code
+
+def round_rect(values):
+    """Rounds like assigning floats to pygame Rect attributes: halves away from zero."""
+    return np.where(values >= 0, np.floor(values + 0.5), np.ceil(values - 0.5)).astype(np.int32)
+
+class EnemySystem:
+    """All enemies as NumPy arrays, advanced in one batched update per frame.
+
+    Reproduces Enemy's wandering state machine, animation counters and wall
+    collisions exactly (for the same seed the positions, states and frames
+    match the sprite version), but without a Python object per enemy."""
+    PER_ENEMY = (
+        'x', 'y', 'previous_x', 'previous_y', 'direction', 'state', 'number_steps', 'current_steps',
+        'collision_reaction_counter', 'animation_counter', 'health', 'frame', 'frame_direction',
+    )
+
+    def __init__(self, game, positions):
+        self.game = game
+        self.rng = game.rng
+        self.params = game.enemy_params
+        count = len(positions)
+
+        # Same random draws, in the same order, as Enemy.__init__
+        directions, number_steps = [], []
+        for _ in range(count):
+            directions.append(self.rng.choice(range(len(DIRECTIONS))))
+            number_steps.append(self.rng.choice(self.params['number_steps']))
+
+        tiles = np.array(positions, dtype=np.int32).reshape(count, 2)
+        self.x = tiles[:, 0] * TILESIZE
+        self.y = tiles[:, 1] * TILESIZE
+        self.previous_x = self.x  # Positions at the start of the tick, for render interpolation
+        self.previous_y = self.y
+        self.direction = np.array(directions, dtype=np.int8)
+        self.state = np.full(count, MOVING, dtype=np.int8)
+        self.number_steps = np.array(number_steps, dtype=np.int32)
+        self.current_steps = np.zeros(count, dtype=np.int32)
+        self.collision_reaction_counter = np.zeros(count, dtype=np.int32)
+        self.animation_counter = np.ones(count, dtype=np.float64)
+        self.health = np.full(count, self.params['health'], dtype=np.int32)
+        self.frame = np.zeros(count, dtype=np.int8)  # Animation frame shown
+        self.frame_direction = np.full(count, DOWN, dtype=np.int8)  # Row of the frame shown (set before collisions turn the enemy)
+
+        # One shared animation table, indexed [direction code][frame]
+        animations = game.enemy_spritesheet.get_animations()
+        self.frames = [animations[name] for name in DIRECTIONS]
+
+        self.flags = np.frombuffer(game.grid.flags, dtype=np.uint8).reshape(game.grid.rows, game.grid.cols)
+        self.navigation = None
+        if game.navigation:
+            size = game.navigation.size  # A square around the player, placed by navigation.origin
+            self.navigation = np.frombuffer(game.navigation.directions, dtype=np.uint8).reshape(size, size)
+
+    def __len__(self):
+        return len(self.x)
+
+    def update(self, dt):
+        step = self.params['steps'] * dt
+        self.previous_x = self.x
+        self.previous_y = self.y
+        state = self.state
+        direction = self.direction
+        current_steps = self.current_steps
+        animation_counter = self.animation_counter
+
+        moving = state == MOVING
+        stalling = state == STALLING
+        reacting = state == COLLISION_REACTING
+        animation_counter[reacting] = 0
+
+        # Movement
+        if self.navigation is not None:
+            self.steer(moving)
+        x_change = np.zeros(len(self))
+        y_change = np.zeros(len(self))
+        x_change[moving & (direction == LEFT)] = -step
+        x_change[moving & (direction == RIGHT)] = step
+        y_change[moving & (direction == UP)] = -step
+        y_change[moving & (direction == DOWN)] = step
+        current_steps[moving | stalling] += 1
+
+        woken = stalling & (current_steps == self.params['stall_steps'])
+        state[woken] = MOVING
+        current_steps[woken] = 0
+        for i in np.flatnonzero(woken):  # Index order matches the sprite update order
+            direction[i] = self.rng.choice(range(len(DIRECTIONS)))
+
+        self.collision_reaction_counter[reacting] += 1
+        recovered = reacting & (self.collision_reaction_counter >= self.params['collision_reacting_steps'])
+        state[recovered] = MOVING
+        current_steps[recovered] = 0
+
+        # Animation, driven by whether the enemy was moving at the start of the frame
+        animation_counter[moving] += 0.2
+        animation_counter[moving & (animation_counter >= 3)] = 0
+        animation_counter[~moving] = 0
+        self.frame = np.where(moving, animation_counter.astype(np.int8), 1)
+        self.frame_direction = direction.copy()
+
+        # Move and collide one axis at a time, like Enemy.update
+        with profiler.scope('collide_block'):
+            self.x = round_rect(self.x + x_change)
+            self.collide_block(x_change, horizontal=True)
+            self.y = round_rect(self.y + y_change)
+            self.collide_block(y_change, horizontal=False)
+
+        animation_counter[state != COLLISION_REACTING] += 1
+
+        finished = current_steps == self.number_steps
+        current_steps[finished & (state != STALLING)] = 0
+        state[finished] = STALLING
+
+    def steer(self, moving):
+        """Turns moving enemies toward the player along the flow field, like Enemy.steer."""
+        rows, cols = self.navigation.shape
+        first_col, first_row = self.game.navigation.origin
+        col = (self.x + TILESIZE // 2) // TILESIZE - first_col
+        row = (self.y + TILESIZE // 2) // TILESIZE - first_row
+        inside = (col >= 0) & (col < cols) & (row >= 0) & (row < rows)
+        code = np.where(inside, self.navigation[row.clip(0, rows - 1), col.clip(0, cols - 1)], 0)
+        wanted = code.astype(np.int8) - 1
+
+        horizontal = self.direction <= RIGHT
+        aligned = np.where(horizontal, self.x, self.y) % TILESIZE == 0
+        turn = moving & (code > 0) & (((wanted <= RIGHT) == horizontal) | aligned)
+        self.direction[turn] = wanted[turn]
+
+    def collide_block(self, change, horizontal):
+        """Resolves overlaps with solid tiles, visiting the (up to 2x2) overlapped tiles in row-major order."""
+        rows, cols = self.flags.shape
+        profiler.count('tile tests', 4 * len(self))
+        first_col = self.x // TILESIZE
+        first_row = self.y // TILESIZE
+        last_col = (self.x + TILESIZE - 1) // TILESIZE
+        last_row = (self.y + TILESIZE - 1) // TILESIZE
+
+        for row, row_valid in ((first_row, True), (last_row, last_row != first_row)):
+            for col, col_valid in ((first_col, True), (last_col, last_col != first_col)):
+                inside = row_valid & col_valid & (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+                tile_x = col * TILESIZE
+                tile_y = row * TILESIZE
+                hit = inside & (self.flags[row.clip(0, rows - 1), col.clip(0, cols - 1)] & TILE_SOLID).astype(bool)
+                # Earlier tiles may already have pushed the enemy clear
+                hit &= (self.x < tile_x + TILESIZE) & (tile_x < self.x + TILESIZE)
+                hit &= (self.y < tile_y + TILESIZE) & (tile_y < self.y + TILESIZE)
+                if not hit.any():
+                    continue
+
+                self.state[hit] = COLLISION_REACTING
+                if horizontal:
+                    right = hit & (change > 0)
+                    left = hit & (change < 0)
+                    self.x[right] = tile_x[right] - TILESIZE
+                    self.direction[right] = LEFT
+                    self.x[left] = tile_x[left] + TILESIZE
+                    self.direction[left] = RIGHT
+                else:
+                    down = hit & (change > 0)
+                    up = hit & (change < 0)
+                    self.y[down] = tile_y[down] - TILESIZE
+                    self.direction[down] = UP
+                    self.y[up] = tile_y[up] + TILESIZE
+                    self.direction[up] = DOWN
+
+    def hit_test(self, px, py, half):
+        """Index of an enemy (the lowest) overlapped by each square of half-size `half`
+        centred on (px, py), or -1. Enemies are bucketed by the tile of their top-left corner."""
+        result = np.full(len(px), -1, dtype=np.int64)
+        if not len(self) or not len(px):
+            return result
+
+        def key(col, row):
+            return (row.astype(np.int64) + 2) * (1 << 22) + (col + 2)
+
+        order = np.argsort(key(self.x // TILESIZE, self.y // TILESIZE), kind='stable')
+        keys = key(self.x // TILESIZE, self.y // TILESIZE)[order]
+
+        # Top-left tiles of enemies that can reach the square span at most 3 columns and rows
+        left, top = px - half, py - half
+        first_col = ((left - TILESIZE + 1) // TILESIZE).astype(np.int64)
+        first_row = ((top - TILESIZE + 1) // TILESIZE).astype(np.int64)
+        best = np.full(len(px), len(self), dtype=np.int64)
+        for row_offset in range(3):
+            for col_offset in range(3):
+                cell = key(first_col + col_offset, first_row + row_offset)
+                start = np.searchsorted(keys, cell, 'left')
+                count = np.searchsorted(keys, cell, 'right') - start
+                for k in range(int(count.max())):
+                    has = k < count
+                    index = order[np.minimum(start + k, len(order) - 1)]
+                    x, y = self.x[index], self.y[index]
+                    hit = has & (x < left + 2 * half) & (left < x + TILESIZE) & (y < top + 2 * half) & (top < y + TILESIZE)
+                    better = hit & (index < best)
+                    best[better] = index[better]
+        found = best < len(self)
+        result[found] = best[found]
+        return result
+
+    def damage(self, indices, amount=1):
+        """Applies `amount` per entry in `indices` (repeats stack) and removes enemies that die."""
+        if not len(indices):
+            return
+        np.subtract.at(self.health, indices, amount)
+        dead = self.health <= 0
+        if dead.any():
+            self.remove(dead)
+
+    def remove(self, mask):
+        """Drops the enemies selected by a boolean mask, keeping the others in spawn order."""
+        keep = ~mask
+        for name in self.PER_ENEMY:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def query(self, rect):
+        """Rects of the enemies overlapping `rect`, in spawn order."""
+        hit = (self.x < rect.right) & (rect.left < self.x + TILESIZE) & (self.y < rect.bottom) & (rect.top < self.y + TILESIZE)
+        return [pygame.Rect(int(self.x[i]), int(self.y[i]), TILESIZE, TILESIZE) for i in np.flatnonzero(hit)]
+
+    def visible(self, view, alpha=1.0):
+        """(key, image, screen rect) for each enemy overlapping the world-space `view` rect,
+        drawn `alpha` of the way from its previous tick's position to its current one."""
+        hit = np.flatnonzero((self.x < view.right) & (view.left < self.x + TILESIZE) & (self.y < view.bottom) & (view.top < self.y + TILESIZE))
+        x = np.rint(self.previous_x[hit] + (self.x[hit] - self.previous_x[hit]) * alpha).astype(np.int32) - view.x
+        y = np.rint(self.previous_y[hit] + (self.y[hit] - self.previous_y[hit]) * alpha).astype(np.int32) - view.y
+        frames = self.frames
+        return [
+            (('enemy', i), frames[self.frame_direction[i]][self.frame[i]], pygame.Rect(int(x[n]), int(y[n]), TILESIZE, TILESIZE))
+            for n, i in enumerate(hit)
+        ]
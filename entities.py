@@ -0,0 +1,75 @@
+"""Compact entities: per-instance state in __slots__, everything shared in a Kind.
+
+A pygame Sprite carries a __dict__ and a set of its groups, and each enemy
+used to repeat the game, its animation table, speeds and layer in that dict.
+An Entity holds only what differs between instances, in slots, and reads the
+rest from its kind, one object shared by every entity of that type.
+Directions and states are small ints rather than strings.
+
+Entity also has the methods pygame's groups call on their members
+(add_internal, remove_internal), so entities still live in Groups alongside
+real Sprites. Enemies are kept out of all_sprites: the renderer and the LOD
+scheduler find them through the spatial hash, so one group is enough.
+Test membership with group.has_internal(entity); `entity in group` only
+works after pygame's Sprite check fails, and is about 4x slower.
+"""
+from settings import *
+
+# Direction codes: indices into ENEMY_DIRECTIONS, the order of the random direction choice
+LEFT, RIGHT, UP, DOWN = range(len(ENEMY_DIRECTIONS))
+
+# State codes
+MOVING, STALLING, COLLISION_REACTING = range(3)
+STATES = ('moving', 'stalling', 'collision_reacting')  # Names, for display and debugging
+
+class Kind:
+    """Data shared by every entity of one type: the game, its draw layer and its frames by direction code."""
+    def __init__(self, game, layer, frames):
+        self.game = game
+        self.layer = layer
+        self.frames = frames
+
+class Entity:
+    """Sprite stand-in without a __dict__. Subclasses list their own fields in __slots__."""
+    __slots__ = ('kind', '_groups')
+
+    def __init__(self, kind, *groups):
+        self.kind = kind
+        self._groups = ()  # Usually one group, so a tuple beats Sprite's set
+        self.add(*groups)
+
+    @property
+    def layer(self):
+        return self.kind.layer  # Read by the renderer, like Sprite.layer
+
+    def add(self, *groups):
+        for group in groups:
+            if not group.has_internal(self):
+                group.add_internal(self)
+                self.add_internal(group)
+
+    def remove(self, *groups):
+        for group in groups:
+            if group.has_internal(self):
+                group.remove_internal(self)
+                self.remove_internal(group)
+
+    def add_internal(self, group):
+        self._groups += (group,)
+
+    def remove_internal(self, group):
+        self._groups = tuple(other for other in self._groups if other is not group)
+
+    def groups(self):
+        return list(self._groups)
+
+    def alive(self):
+        return bool(self._groups)
+
+    def kill(self):
+        for group in self._groups:
+            group.remove_internal(self)
+        self._groups = ()
+
+    def update(self, *args, **kwargs):
+        pass
@@ -1,78 +1,301 @@
-import pygame, sys
+import argparse, os, random, sys, time
+import pygame
 from settings import *
 from sprites import *
+from tilemap import TerrainLayer, TileGrid, StreamedTerrainLayer, StreamedTileGrid
+from spatial import SpatialHash
+from camera import Camera
+from renderer import Renderer
+from world import WorldFile, ChunkManager
+from navigation import FlowField
+from weapon import ProjectilePool
+from profiler import profiler, ProfilerOverlay
+import snapshot
+from replay import Recorder
+from scheduler import UpdateScheduler
 from pygame.sprite import LayeredUpdates
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False, seed=None, input_source=None, world_map=WORLD_MAP,
+                 vectorized_enemies=VECTORIZED_ENEMIES, world_file=None, enemy_params=None, lod=LOD_ENABLED):
+        """headless runs without a real window (SDL dummy driver), e.g. for benchmarks.
+        seed makes enemy behaviour reproducible; input_source replaces the keyboard.
+        vectorized_enemies runs enemies as one NumPy EnemySystem instead of sprites.
+        world_file streams the map from a chunked world file (see world.py) instead of world_map.
+        enemy_params overrides entries of ENEMY_PARAMS for this game only.
+        lod updates distant sprite enemies less often (see scheduler.py)."""
+        self.started = time.perf_counter()
+        self.first_frame_s = None  # Time to first frame, set by the first render()
+        self.headless = headless
+        self.vectorized_enemies = vectorized_enemies
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
         pygame.init()
         self.screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
         pygame.display.set_caption('Basic RPG')
         self.clock = pygame.time.Clock()
         self.running = True
+        self.world_map = world_map
+        self.world_file = world_file
+        if world_file and vectorized_enemies:
+            raise ValueError("streamed worlds spawn enemies per chunk, which the vectorized enemy system does not support")
+        unknown = set(enemy_params or {}) - set(ENEMY_PARAMS)
+        if unknown:
+            raise ValueError(f"unknown enemy parameters: {', '.join(sorted(unknown))}")
+        self.enemy_params = {**ENEMY_PARAMS, **(enemy_params or {})}
+        self.seed = random.randrange(2 ** 63) if seed is None else seed  # Kept so a session can be replayed
+        self.rng = random.Random(self.seed)  # All gameplay randomness goes through this
+        self.input = input_source or KeyboardInput()
+        self.input_state = 0
+        self.enemies_spawned = 0
+        self.tick = 0  # Simulation ticks so far
         
-        # Load spritesheets
+        # Load spritesheets: frames come from the asset packs, the PNGs decode in the background
         self.terrain_spritesheet = Spritesheet('assets/images/terrain.png')
         self.player_spritesheet = Spritesheet('assets/images/cats.png')
         self.enemy_spritesheet = Spritesheet('assets/images/evil.png')
         self.weapon_spritesheet = Spritesheet('assets/images/sword.png')
         self.bullet_spritesheet = Spritesheet('assets/images/powerBall.png')
+        self.spritesheets = {
+            'terrain': self.terrain_spritesheet,
+            'player': self.player_spritesheet,
+            'enemy': self.enemy_spritesheet,
+            'weapon': self.weapon_spritesheet,
+            'bullet': self.bullet_spritesheet,
+        }
         
         # Create sprite groups
         self.all_sprites = LayeredUpdates()
-        self.blocks = pygame.sprite.Group()
         self.water = pygame.sprite.Group()
         self.enemies = pygame.sprite.Group()
         self.player_group = pygame.sprite.GroupSingle()  # Single player
-        self.weapons = pygame.sprite.Group()
-        self.bullets = pygame.sprite.Group()
         self.healthbar = pygame.sprite.Group()
         
+        # Broadphase for entity-vs-entity collisions (player, enemies, projectiles)
+        self.spatial = SpatialHash()
+        self.projectiles = ProjectilePool(self)  # All shots, as arrays rather than sprites
+        self.overlay = ProfilerOverlay(profiler)  # F3 toggles it, F4 dumps a trace
+        self.enemy_kind = EnemyKind(self)  # Frames and parameters shared by every sprite enemy
+        self.enemy_records = snapshot.EnemyRecords()  # Their snapshot records, kept between saves
+        
         self.create_tile_map()
+        # The vectorized enemy system already updates every enemy in one batch
+        self.scheduler = UpdateScheduler(self) if lod and not self.enemy_system else None
+        # Recent snapshots, for rewinding; streamed worlds can't be snapshotted
+        self.history = snapshot.History(self) if not self.chunk_manager else None
+        self.rewinding = False
+        self.recorder = None  # Set by record()
+        if headless:
+            for sheet in self.spritesheets.values():
+                sheet.wait()  # No blank frames in benchmarks or screenshots
         
     def create_tile_map(self):
-        for i, row in enumerate(WORLD_MAP):
+        self.chunk_manager = None
+        self.enemy_system = None
+        if self.world_file:
+            self.create_streamed_map()
+            return
+
+        # Ground and blocks are drawn by the terrain layer, not as sprites,
+        # and walls collide through the passability grid
+        cols, rows = len(self.world_map[0]), len(self.world_map)
+        tiles = bytearray(''.join(self.world_map).encode('ascii'))
+        self.create_layers(cols, rows, TerrainLayer(self, cols, rows, tiles), TileGrid(tiles, cols, rows))
+        
+        enemy_positions = []
+        for i, row in enumerate(self.world_map):
             for j, column in enumerate(row):
-                ground = Ground(self, j, i)
-                self.all_sprites.change_layer(ground, 1)
-                
-                if column == 'B':
-                    block = Block(self, j, i)
-                    self.blocks.add(block)  # Add block to blocks group
-                    self.all_sprites.change_layer(block, 2)  # Set block layer
                 if column == 'P':
                     self.player = Player(self, j, i)  # Player initialization
-                    self.all_sprites.change_layer(self.player, 3)  # Set player layer
                     self.player_group.add(self.player)  # Add player to the player group
                 if column == 'E':
-                    enemy = Enemy(self, j, i)
-                    self.enemies.add(enemy)  # Add enemy to enemies group
-                    self.all_sprites.change_layer(enemy, 3)  # Set enemy layer
+                    if self.vectorized_enemies:
+                        enemy_positions.append((j, i))
+                    else:
+                        enemy = Enemy(self, j, i)
+                        self.enemies.add(enemy)  # Add enemy to enemies group
+
+        if self.vectorized_enemies:
+            from enemy_system import EnemySystem  # Only imported when used
+            self.enemy_system = EnemySystem(self, enemy_positions)
+
+    def create_layers(self, cols, rows, terrain, grid):
+        self.terrain = terrain
+        self.grid = grid
+        self.navigation = FlowField(self.grid) if self.enemy_params['chase'] else None
+        self.camera = Camera(WIN_WIDTH, WIN_HEIGHT, cols * TILESIZE, rows * TILESIZE)
+        self.renderer = Renderer(self)
+
+    def create_streamed_map(self):
+        # Tiles are kept only for loaded chunks; the chunk manager loads (and spawns) those near the player
+        self.world = WorldFile(self.world_file)
+        cols, rows = self.world.cols, self.world.rows
+        self.create_layers(cols, rows, StreamedTerrainLayer(self, cols, rows), StreamedTileGrid(cols, rows))
+        self.player = Player(self, *self.world.player_spawn)
+        self.player_group.add(self.player)
+        self.chunk_manager = ChunkManager(self, self.world)
+        self.chunk_manager.update(self.player.rect)
+
+    def set_tile(self, col, row, tile):
+        self.terrain.set_tile(col, row, tile)
+        self.grid.set_tile(col, row, tile)
+        if self.navigation:
+            self.navigation.invalidate()
+
+    def enemy_rects(self, rect):
+        """Rects of the enemies overlapping `rect`, from the spatial hash or the enemy system."""
+        if self.enemy_system:
+            return self.enemy_system.query(rect)
+        hits = self.spatial.query(rect, self.enemies)
+        hits.sort(key=lambda enemy: enemy.spawn_order)  # Same order as the enemies group / enemy system
+        return [enemy.rect for enemy in hits]
 
     def update(self, dt):
-        self.player.update(dt)
-        self.all_sprites.update(dt)
+        """Advances the simulation by one tick; every entity updates exactly once."""
+        self.input_state = self.input.read()
+        self.tick += 1
+        if self.navigation:
+            with profiler.scope('navigation'):
+                self.navigation.update(self.player.rect)  # Only rebuilds when the player changed tile
+        if self.enemy_system:
+            with profiler.scope('enemy_system'):
+                self.enemy_system.update(dt)  # Enemies update before the player, like sprite enemies
+        with profiler.scope('sprites'):
+            if self.scheduler:
+                self.scheduler.update(dt)  # Enemies, by distance tier
+            else:
+                self.enemies.update(dt)  # Every enemy, in spawn order
+            self.enemy_kind.report_collisions()
+            self.player_group.update(dt)
+        with profiler.scope('projectiles'):
+            self.projectiles.update()
+        if self.chunk_manager:
+            with profiler.scope('streaming'):
+                self.chunk_manager.update(self.player.rect)
     
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 self.running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.overlay.visible = not self.overlay.visible
+                profiler.enabled = self.overlay.visible or PROFILER_ENABLED
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F4:
+                profiler.dump_trace(PROFILER_TRACE_PATH)
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                try:
+                    data = snapshot.save(self)
+                    with open(SNAPSHOT_PATH, 'wb') as f:
+                        f.write(data)
+                except (ValueError, OSError) as error:
+                    print(f"quicksave failed: {error}", file=sys.stderr)
+            elif self.recorder:
+                continue  # Loading or rewinding would break the recorded input's link to the state
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F9 and os.path.exists(SNAPSHOT_PATH):
+                try:
+                    with open(SNAPSHOT_PATH, 'rb') as f:
+                        snapshot.restore(self, f.read())
+                except (ValueError, OSError) as error:  # Another map or enemy mode, or a damaged file
+                    print(f"quickload failed: {error}", file=sys.stderr)
+                else:
+                    if self.history is not None:
+                        self.history.clear()  # Rewinding must not jump back into the timeline before the load
+            elif event.type in (pygame.KEYDOWN, pygame.KEYUP) and event.key == pygame.K_BACKSPACE and self.history is not None:
+                self.rewinding = event.type == pygame.KEYDOWN
                 
-    def draw(self):
-        self.screen.fill(BG_COLOR)
-        self.all_sprites.draw(self.screen)
-        pygame.display.update()
-        self.clock.tick(FPS)
+    def poll_assets(self):
+        """Picks up spritesheets that finished loading in the background; call once per frame."""
+        for sheet in self.spritesheets.values():
+            if sheet.poll() and sheet is self.terrain_spritesheet:
+                for chunk in list(self.terrain.chunks):
+                    self.terrain.forget_chunk(*chunk)  # Rendered with blank tiles
+
+    def render(self, alpha=1.0):
+        """Draws the world `alpha` of the way from the previous tick's state to the current one."""
+        self.camera.follow(self.player, alpha)
+        self.renderer.draw(alpha)  # Only sprites inside the viewport, found through the spatial hash
+        if self.first_frame_s is None:
+            self.first_frame_s = time.perf_counter() - self.started
+
+    def run_frames(self, frames, dt=TICK):
+        """Runs a number of frames with a fixed dt as fast as possible (no clock throttling)."""
+        for _ in range(frames):
+            profiler.begin_frame()
+            pygame.event.pump()
+            self.poll_assets()
+            with profiler.scope('update'):
+                self.update(dt)
+            if self.history is not None:
+                with profiler.scope('history'):
+                    self.history.record()  # Part of every played frame's cost
+            with profiler.scope('draw'):
+                self.render()
+            profiler.end_frame()
+                    
+    def record(self):
+        """Starts logging input for replay.py; call before the first tick. Loading and rewinding are off while recording."""
+        self.recorder = Recorder(self)
+        return self.recorder
+
+    def cache_stats(self):
+        return {name: sheet.stats() for name, sheet in self.spritesheets.items()}
                     
     def main(self):
+        # Fixed-timestep loop: the simulation advances in TICK steps however fast
+        # frames are drawn, and rendering interpolates between the last two ticks
+        accumulator = 0.0
         while self.running:
-            dt = self.clock.tick(FPS) / 1000  # Convert milliseconds to seconds
-            self.handle_events()
-            self.update(dt)
-            self.draw()
+            frame_time = self.clock.tick(FPS) / 1000  # Convert milliseconds to seconds
+            profiler.begin_frame()  # After the wait, so frame times show work, not the FPS cap
+            accumulator += min(frame_time, TICK * MAX_CATCHUP_TICKS)
+            with profiler.scope('events'):
+                self.handle_events()
+                self.poll_assets()
+
+            ticks = 0
+            while accumulator >= TICK and ticks < MAX_CATCHUP_TICKS:
+                with profiler.scope('update'):
+                    if self.rewinding:
+                        self.history.rewind()  # Steps back instead of simulating; stops at the oldest snapshot
+                    else:
+                        self.update(TICK)
+                        if self.history is not None:
+                            self.history.record()
+                        if self.recorder:
+                            self.recorder.record()
+                accumulator -= TICK
+                ticks += 1
+            if ticks == MAX_CATCHUP_TICKS:
+                accumulator = min(accumulator, TICK)  # Too far behind: drop time instead of spiralling
+
+            with profiler.scope('draw'):
+                self.render(accumulator / TICK)
+            profiler.end_frame()
         
 if __name__ == "__main__":
-    game = Game()
-    game.main()
+    parser = argparse.ArgumentParser(description="Play the game.")
+    parser.add_argument('world', nargs='?', help="streamed world file (see world.py)")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--record', metavar='LOG', help="log input to LOG for replay.py")
+    parser.add_argument('--startup', action='store_true', help="print the time to first frame and quit")
+    args = parser.parse_args()
+
+    game = Game(seed=args.seed, world_file=args.world)
+    if args.startup:
+        game.render()
+        print(f"first frame after {game.first_frame_s * 1000:.1f} ms")
+        for sheet in game.spritesheets.values():
+            sheet.wait()  # Leaves up-to-date asset packs for the next start
+    else:
+        if args.record:
+            game.record()
+        game.main()
+        if args.record:
+            game.recorder.save(args.record)
+    if SHOW_STATS:
+        print(f"first frame after {game.first_frame_s * 1000:.1f} ms")
+        for name, stats in game.cache_stats().items():
+            print(f"{name}: {stats['frames']} frames ({stats['packed']} packed), {stats['hits']} hits, {stats['misses']} misses")
     pygame.quit()
     sys.exit()
\ No newline at end of file
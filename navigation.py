@@ -0,0 +1,98 @@
+import time
+from collections import deque
+from settings import *
+from profiler import profiler
+
+# Tile steps for ENEMY_DIRECTIONS ('left', 'right', 'up', 'down')
+STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+class FlowField:
+    """Shared map of which way to step, from every tile near the player, to reach the player.
+
+    The field is a breadth-first search over the passability grid out to
+    `radius` steps from the player's tile. It is rebuilt only when the player
+    enters another tile or the map changes (invalidate()), so any number of
+    enemies can read their next step with one lookup. Nothing beyond `radius`
+    is ever reached, so the field only covers the square of tiles within
+    `radius` of the player, whatever the map size. Each tile holds a
+    direction code: 0 for none (out of range or unreachable), otherwise the
+    index in ENEMY_DIRECTIONS plus one."""
+    def __init__(self, grid, radius=NAV_RADIUS):
+        self.grid = grid
+        self.radius = radius
+        self.size = 2 * radius + 1  # Side of the square, in tiles
+        self.directions = bytearray(self.size * self.size)  # Row-major; updated in place (the enemy system views it)
+        self.origin = (0, 0)  # Map tile at the square's top-left
+        self.reached = []  # Indices set by the last build
+        self.target = None
+
+        # Rebuild cost, for the profiler and benchmarks
+        self.rebuilds = 0
+        self.last_rebuild_ms = 0.0
+        self.total_rebuild_ms = 0.0
+
+    def invalidate(self):
+        """Forces a rebuild on the next update, e.g. after tiles changed."""
+        self.target = None
+
+    def update(self, rect):
+        """Rebuilds the field if the player (`rect`) is on a different tile than last time."""
+        target = (rect.centerx // TILESIZE, rect.centery // TILESIZE)
+        if target != self.target:
+            self.target = target
+            with profiler.scope('flow_field_rebuild'):
+                self.rebuild(*target)
+
+    def rebuild(self, target_col, target_row):
+        start = time.perf_counter()
+        radius, size = self.radius, self.size
+        self.origin = (target_col - radius, target_row - radius)
+        flags = self.grid.flag_window(*self.origin, size, size)  # Outside the map reads as solid
+        directions = self.directions
+
+        for index in self.reached:
+            directions[index] = 0
+        self.reached = reached = []
+
+        if 0 <= target_col < self.grid.cols and 0 <= target_row < self.grid.rows:
+            target = radius * size + radius  # The centre of the square
+            directions[target] = 255  # Placeholder so the search doesn't revisit it
+            reached.append(target)
+            queue = deque([(radius, radius, 0)])
+            while queue:
+                col, row, distance = queue.popleft()
+                if distance == radius:
+                    continue
+                for code, (step_x, step_y) in enumerate(STEPS):
+                    # Neighbour that steps back onto this tile; within `radius` of the centre, so inside the square
+                    next_col, next_row = col - step_x, row - step_y
+                    index = next_row * size + next_col
+                    if directions[index] or flags[index] & TILE_SOLID:
+                        continue
+                    directions[index] = code + 1
+                    reached.append(index)
+                    queue.append((next_col, next_row, distance + 1))
+            directions[target] = 0  # Already there
+
+        elapsed = (time.perf_counter() - start) * 1000
+        self.rebuilds += 1
+        self.last_rebuild_ms = elapsed
+        self.total_rebuild_ms += elapsed
+
+    def direction_at(self, col, row):
+        """Direction code (index in ENEMY_DIRECTIONS) to step from a tile toward the player, or None."""
+        col -= self.origin[0]
+        row -= self.origin[1]
+        if 0 <= col < self.size and 0 <= row < self.size:
+            code = self.directions[row * self.size + col]
+            if code:
+                return code - 1
+        return None
+
+    def stats(self):
+        return {
+            'rebuilds': self.rebuilds,
+            'last_rebuild_ms': self.last_rebuild_ms,
+            'total_rebuild_ms': self.total_rebuild_ms,
+            'tiles': len(self.reached),
+        }
@@ -0,0 +1,173 @@
+"""Per-frame instrumentation: named timing scopes, counters, an overlay and trace export.
+
+Wrap a phase in `with profiler.scope('name'):` and count things with
+`profiler.count('name', n)`; add() takes time summed over many tiny calls. While the profiler is disabled, scope() hands
+back one shared no-op context manager and count() returns at once, so the
+calls can stay in hot paths. Frames are kept in a fixed-size ring buffer;
+the overlay (F3) shows rolling averages and a frame-time graph, and
+dump_trace() (F4) writes Chrome trace-event JSON (chrome://tracing, Perfetto).
+"""
+import json, time
+from collections import deque
+import pygame
+from settings import *
+
+class NullScope:
+    """What scope() returns while disabled: does nothing, allocates nothing."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SCOPE = NullScope()
+
+class Scope:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+class Frame:
+    __slots__ = ('start', 'duration', 'totals', 'counters', 'events')
+
+    def __init__(self, start):
+        self.start = start
+        self.duration = 0.0
+        self.totals = {}  # scope name -> [seconds, calls]
+        self.counters = {}  # counter name -> total this frame
+        self.events = []  # (name, start, end) for the trace, capped at PROFILER_MAX_EVENTS
+
+class Profiler:
+    def __init__(self, enabled=PROFILER_ENABLED, history=PROFILER_HISTORY):
+        self.enabled = enabled
+        self.frames = deque(maxlen=history)  # Ring buffer of finished frames
+        self.current = None
+        self.origin = time.perf_counter()  # Trace timestamps are relative to this
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def count(self, name, amount=1):
+        if self.enabled and self.current:
+            counters = self.current.counters
+            counters[name] = counters.get(name, 0) + amount
+
+    def record(self, name, start, end):
+        frame = self.current
+        if frame is None:
+            return
+        total = frame.totals.get(name)
+        if total is None:
+            frame.totals[name] = [end - start, 1]
+        else:
+            total[0] += end - start
+            total[1] += 1
+        if len(frame.events) < PROFILER_MAX_EVENTS:
+            frame.events.append((name, start, end))
+
+    def add(self, name, seconds, calls=1):
+        """Adds time measured outside scope(), e.g. summed over thousands of calls too short to
+        scope one by one. Counts towards the frame's totals but leaves no trace event."""
+        frame = self.current
+        if frame is None:
+            return
+        total = frame.totals.get(name)
+        if total is None:
+            frame.totals[name] = [seconds, calls]
+        else:
+            total[0] += seconds
+            total[1] += calls
+
+    def begin_frame(self):
+        if self.enabled:
+            self.current = Frame(time.perf_counter())
+
+    def end_frame(self):
+        frame = self.current
+        if frame is not None:
+            frame.duration = time.perf_counter() - frame.start
+            self.frames.append(frame)
+            self.current = None
+
+    def averages(self):
+        """Mean milliseconds per frame of each scope, and mean per-frame value of each counter."""
+        if not self.frames:
+            return {}, {}
+        scopes, counters = {}, {}
+        for frame in self.frames:
+            for name, (seconds, _) in frame.totals.items():
+                scopes[name] = scopes.get(name, 0) + seconds
+            for name, value in frame.counters.items():
+                counters[name] = counters.get(name, 0) + value
+        count = len(self.frames)
+        return ({name: seconds * 1000 / count for name, seconds in scopes.items()},
+                {name: value / count for name, value in counters.items()})
+
+    def dump_trace(self, path):
+        """Writes the buffered frames as Chrome trace-event JSON."""
+        events = []
+        for frame in self.frames:
+            start = (frame.start - self.origin) * 1e6
+            events.append({'name': 'frame', 'ph': 'X', 'ts': start, 'dur': frame.duration * 1e6, 'pid': 0, 'tid': 0})
+            for name, begin, end in frame.events:
+                events.append({'name': name, 'ph': 'X', 'ts': (begin - self.origin) * 1e6, 'dur': (end - begin) * 1e6, 'pid': 0, 'tid': 0})
+            if frame.counters:
+                events.append({'name': 'counters', 'ph': 'C', 'ts': start, 'pid': 0, 'args': frame.counters})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+profiler = Profiler()  # Shared by the game, so low-level code can count without a game reference
+
+class ProfilerOverlay:
+    """On-screen panel with rolling scope averages, counters and a frame-time graph."""
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.visible = False
+        self.rect = pygame.Rect(8, 8, 280, 0)  # Height follows the content
+        self.font = pygame.font.Font(None, 18)
+        self.lines = []
+        self.graph = []
+
+    def prepare(self):
+        """Works out the panel contents and sets self.rect, so callers know the area before drawing."""
+        scopes, counters = self.profiler.averages()
+        self.graph = list(self.profiler.frames)[-PROFILER_GRAPH_FRAMES:]
+        frame_ms = sum(frame.duration for frame in self.graph) * 1000 / len(self.graph) if self.graph else 0.0
+
+        self.lines = [f"frame {frame_ms:.2f} ms"]
+        self.lines += [f"{name} {ms:.2f} ms" for name, ms in sorted(scopes.items(), key=lambda item: -item[1])]
+        self.lines += [f"{name} {value:.0f}" for name, value in sorted(counters.items())]
+        self.rect.height = len(self.lines) * self.font.get_linesize() + 52  # Text, graph and margins
+
+    def draw(self, screen):
+        """Draws the panel prepared by prepare() at self.rect."""
+        panel = pygame.Surface(self.rect.size)
+        profiler.count('surfaces allocated')
+        panel.set_alpha(200)
+        panel.fill(BLACK)
+        line_height = self.font.get_linesize()
+        for i, line in enumerate(self.lines):
+            panel.blit(self.font.render(line, True, GREEN), (6, 4 + i * line_height))
+
+        # One bar per frame; the red line is the 60 FPS budget (16.7 ms, at half the graph height)
+        graph_height = 40
+        top = self.rect.height - graph_height - 4
+        bar_width = max((self.rect.width - 12) // PROFILER_GRAPH_FRAMES, 1)
+        for i, frame in enumerate(self.graph):
+            height = min(int(frame.duration * 1000 / 33.3 * graph_height), graph_height)
+            pygame.draw.rect(panel, GREEN, (6 + i * bar_width, top + graph_height - height, bar_width, height))
+        pygame.draw.line(panel, RED, (6, top + graph_height // 2), (self.rect.width - 6, top + graph_height // 2))
+
+        screen.blit(panel, self.rect)
@@ -0,0 +1,102 @@
+import pygame
+from settings import *
+from camera import interpolate
+from profiler import profiler
+
+class Renderer:
+    """Draws the world through the camera, either fully every frame or by updating only dirty rects.
+
+    Dirty-rect mode keeps the terrain under the current view in a background
+    surface. Each frame it restores and redraws only the screen areas where a
+    sprite appeared, moved, changed image or left, and passes just those rects
+    to display.update(). When the camera scrolls, the background is rebuilt
+    and the whole screen is redrawn."""
+    def __init__(self, game, dirty_rects=DIRTY_RECTS):
+        self.game = game
+        self.dirty_rects = dirty_rects
+        self.background = pygame.Surface((WIN_WIDTH, WIN_HEIGHT)).convert()
+        self.background_view = None  # Camera rect the background was rendered for
+        self.background_changes = None  # terrain.changes when the background was rendered
+        self.drawn = {}  # sprite (or enemy key) -> (image, screen rect) as of the last frame
+        self.overlay_rect = None  # Screen area the profiler overlay covered last frame
+
+    def collect(self, alpha=1.0):
+        """{key: (image, screen rect)} for everything in the viewport, in layer order,
+        positioned `alpha` of the way between the previous and current tick.
+
+        Sprites come from a spatial-hash query; vectorized enemies and projectiles from their own arrays."""
+        game = self.game
+        camera = game.camera
+        items = [
+            (sprite.layer, sprite, sprite.image, camera.apply(interpolate(sprite, alpha)))
+            for sprite in game.spatial.query(camera.rect)  # The player and sprite enemies
+        ]
+        if game.enemy_system:
+            items += [(ENEMY_LAYER, key, image, rect) for key, image, rect in game.enemy_system.visible(camera.rect, alpha)]
+        items += [(WEAPON_LAYER, key, image, rect) for key, image, rect in game.projectiles.visible(camera.rect, alpha)]
+        items.sort(key=lambda item: item[0])
+        return {key: (image, rect) for _, key, image, rect in items}
+
+    def draw(self, alpha=1.0):
+        game = self.game
+        camera = game.camera
+        screen = game.screen
+        drawn = self.collect(alpha)
+        profiler.count('sprites drawn', len(drawn))
+        overlay = game.overlay if game.overlay.visible else None
+        if overlay:
+            overlay.prepare()
+
+        if not self.dirty_rects:
+            screen.fill(BG_COLOR)
+            game.terrain.draw(screen, camera.rect)
+            screen.blits(list(drawn.values()), False)
+            if overlay:
+                overlay.draw(screen)
+            pygame.display.update()
+            return
+
+        if camera.rect != self.background_view or game.terrain.changes != self.background_changes:
+            # Scrolled or a tile changed: rebuild the background and push everything
+            self.background.fill(BG_COLOR)
+            game.terrain.draw(self.background, camera.rect)
+            self.background_view = camera.rect.copy()
+            self.background_changes = game.terrain.changes
+            screen.blit(self.background, (0, 0))
+            screen.blits(list(drawn.values()), False)
+            self.overlay_rect = None
+            if overlay:
+                overlay.draw(screen)
+                self.overlay_rect = overlay.rect.copy()
+            pygame.display.update()
+            self.drawn = drawn
+            return
+
+        # Old and new areas of every sprite that changed, appeared or disappeared
+        dirty = []
+        for sprite, old in self.drawn.items():
+            new = drawn.get(sprite)
+            if new != old:
+                dirty.append(old[1])
+                if new:
+                    dirty.append(new[1])
+        for sprite, new in drawn.items():
+            if sprite not in self.drawn:
+                dirty.append(new[1])
+
+        # The overlay changes every frame, so its old and new areas are always redrawn
+        if self.overlay_rect:
+            dirty.append(self.overlay_rect)
+        self.overlay_rect = overlay.rect.copy() if overlay else None
+        if self.overlay_rect:
+            dirty.append(self.overlay_rect)
+
+        if dirty:
+            for rect in dirty:
+                screen.blit(self.background, rect, rect)
+            # Anything overlapping a restored area is redrawn, still in layer order
+            screen.blits([item for item in drawn.values() if item[1].collidelist(dirty) != -1], False)
+            if overlay:
+                overlay.draw(screen)
+            pygame.display.update(dirty)
+        self.drawn = drawn
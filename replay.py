@@ -0,0 +1,134 @@
+"""Input recording and deterministic replay.
+
+Every tick's input state is logged, so a session can be re-simulated exactly
+from its seed: same inputs, same RNG, same state, bit for bit. The log also
+holds state hashes (of snapshot.save) at the start, every
+REPLAY_CHECKPOINT ticks and at the end, so a replay that drifts says where.
+Replays run uncapped and headless, which makes a recorded session a timing
+benchmark too:
+
+    python main.py --record session.rpgr
+    python replay.py session.rpgr
+
+Layout (little-endian): HEADER, the enemy parameters as JSON, the
+zlib-compressed input states (one byte per tick), then the 16-byte hashes.
+"""
+import argparse, hashlib, json, struct, sys, time, zlib
+from settings import *
+from controls import ScriptedInput
+import snapshot
+
+MAGIC = b'RPGR'
+VERSION = 1
+HEADER = struct.Struct('<4sHQ?IIII')  # magic, version, seed, vectorized, ticks, checkpoint interval, params length, inputs length
+HASH_SIZE = 16
+
+def state_hash(game):
+    return hashlib.blake2b(snapshot.save(game), digest_size=HASH_SIZE).digest()
+
+class RecordingInput:
+    """Passes another input source through, keeping every state it returns."""
+    def __init__(self, source):
+        self.source = source
+        self.states = bytearray()  # One byte per tick; INPUT_* bits all fit
+
+    def read(self):
+        state = self.source.read()
+        self.states.append(state)
+        return state
+
+class Recorder:
+    """Logs a game's input and state hashes; record() runs after every tick."""
+    def __init__(self, game, interval=REPLAY_CHECKPOINT):
+        if game.chunk_manager:
+            raise ValueError("streamed worlds can't be recorded, their state can't be snapshotted")
+        if game.tick:
+            raise ValueError("recording has to start on tick 0")
+        self.game = game
+        self.interval = interval
+        self.input = game.input = RecordingInput(game.input)
+        self.hashes = [state_hash(game)]
+
+    def record(self):
+        if self.game.tick % self.interval == 0:
+            self.hashes.append(state_hash(self.game))
+
+    def save(self, path):
+        game = self.game
+        params = json.dumps(game.enemy_params).encode()
+        inputs = zlib.compress(bytes(self.input.states), 9)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, game.seed, game.vectorized_enemies, game.tick, self.interval, len(params), len(inputs)))
+            f.write(params)
+            f.write(inputs)
+            f.write(b''.join(self.hashes))
+            f.write(state_hash(game))  # Final state
+
+def read_log(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, seed, vectorized, ticks, interval, params_length, inputs_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not an input log")
+    if version != VERSION:
+        raise ValueError(f"{path} is input log version {version}, expected {VERSION}")
+    offset = HEADER.size
+    params = json.loads(data[offset:offset + params_length])
+    offset += params_length
+    states = zlib.decompress(data[offset:offset + inputs_length])
+    offset += inputs_length
+    hashes = [data[i:i + HASH_SIZE] for i in range(offset, len(data), HASH_SIZE)]
+    return {'seed': seed, 'vectorized': vectorized, 'ticks': ticks, 'interval': interval,
+            'params': params, 'states': states, 'hashes': hashes}
+
+def replay(log, world_map=WORLD_MAP, render=True):
+    """Re-simulates a read_log() result as fast as possible; returns timings and the first divergent tick (or None)."""
+    from main import Game
+    from benchmark import percentiles
+
+    game = Game(headless=True, seed=log['seed'], input_source=ScriptedInput(log['states']), world_map=world_map,
+                vectorized_enemies=log['vectorized'], enemy_params=log['params'])
+    hashes = iter(log['hashes'])
+    if state_hash(game) != next(hashes):
+        return {'diverged_at': 0}  # Different map, seed or parameters
+
+    samples = []
+    diverged_at = None
+    start = time.perf_counter()
+    for _ in range(log['ticks']):
+        tick_start = time.perf_counter()
+        game.update(TICK)
+        if render:
+            game.render()
+        samples.append(time.perf_counter() - tick_start)
+        if game.tick % log['interval'] == 0 and state_hash(game) != next(hashes):
+            diverged_at = game.tick
+            break
+    elapsed = time.perf_counter() - start
+    if diverged_at is None and state_hash(game) != next(hashes):
+        diverged_at = game.tick
+
+    return {
+        'ticks': game.tick,
+        'recorded_s': log['ticks'] * TICK,
+        'replay_s': elapsed,
+        'ticks_per_s': game.tick / elapsed if elapsed else 0.0,
+        'tick': percentiles(samples) if len(samples) > 1 else None,
+        'diverged_at': diverged_at,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay an input log, check it stays in sync and time it.")
+    parser.add_argument('log')
+    parser.add_argument('--no-render', action='store_true', help="simulate only")
+    args = parser.parse_args()
+
+    result = replay(read_log(args.log), render=not args.no_render)
+    json.dump(result, sys.stdout, indent=2)
+    print()
+    if result['diverged_at'] is not None:
+        print(f"replay diverged at tick {result['diverged_at']}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
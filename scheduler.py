@@ -0,0 +1,57 @@
+from settings import *
+from profiler import profiler
+
+class UpdateScheduler:
+    """Decides which sprite enemies update on each tick, by their distance from the player.
+
+    near     the view plus LOD_NEAR_MARGIN tiles, and the flow-field radius: updated every tick
+    far      within LOD_FAR_RADIUS tiles: updated every LOD_FAR_INTERVAL ticks with the skipped
+             ticks' dt, without animation. Enemies take turns by spawn order, so every tick
+             updates an equal share instead of all of them landing on the same tick
+    dormant  everything else: not updated at all (no catch-up) until the player comes near
+
+    Tiers come from spatial-hash queries around the player, so the cost per tick follows
+    the number of enemies near the player, not the total population. Chosen enemies
+    update in spawn order, like the enemies group."""
+    def __init__(self, game, far_radius=LOD_FAR_RADIUS, far_interval=LOD_FAR_INTERVAL, near_margin=LOD_NEAR_MARGIN):
+        self.game = game
+        self.far_radius = far_radius * TILESIZE
+        self.far_interval = far_interval
+        self.near_margin = near_margin * TILESIZE
+
+    def regions(self):
+        """World rects of the near and far tiers."""
+        game = self.game
+        center = game.player.rect.center
+
+        # Where the camera will be once it follows the player, even before the first draw
+        view = game.camera.rect.copy()
+        view.center = center
+        view.clamp_ip(game.camera.world_rect)
+        near = view.inflate(2 * self.near_margin, 2 * self.near_margin)
+        if game.navigation:
+            chase = game.navigation.radius * TILESIZE
+            near.union_ip(game.player.rect.inflate(2 * chase, 2 * chase))  # Chasing needs every tick's steering
+
+        far = game.player.rect.inflate(2 * self.far_radius, 2 * self.far_radius)
+        return near, far
+
+    def update(self, dt):
+        game = self.game
+        tick = game.tick
+        interval = self.far_interval
+        enemies = game.enemies
+        near_rect, far_rect = self.regions()
+
+        near = set(game.spatial.query(near_rect, enemies))
+        # Cell-level test is enough for the far tier; it only needs to be roughly round the player
+        far = [
+            enemy for enemy in game.spatial.candidates(far_rect)
+            if enemies.has_internal(enemy) and (enemy.spawn_order + tick) % interval == 0 and enemy not in near
+        ]
+        chosen = sorted([*near, *far], key=lambda enemy: enemy.spawn_order)
+        profiler.count('enemy updates', len(chosen))
+
+        for enemy in chosen:
+            ticks = min(tick - enemy.updated_tick, interval)  # Capped, so waking from dormancy isn't one huge step
+            enemy.update(dt * ticks, ticks, enemy in near)
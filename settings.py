@@ -5,9 +5,44 @@ WIN_HEIGHT = 600
 # Tile size
 TILESIZE = 32
 
-# Frames per second (FPS)
+# Terrain chunk size in tiles (static tiles are pre-rendered per chunk)
+CHUNK_SIZE = 16
+
+# Streamed worlds: chunks kept loaded around the player, and most chunks resident at once
+STREAM_RADIUS = 2
+STREAM_BUDGET = 64
+
+# Spatial hash cell size in pixels (broadphase for moving entities)
+SPATIAL_CELL_SIZE = TILESIZE * 4
+
+# Redraw only the screen areas that changed (falls back to a full redraw when the camera scrolls)
+DIRTY_RECTS = False
+
+# Profiler: on from the start (F3 toggles the overlay, F4 dumps a trace either way)
+PROFILER_ENABLED = False
+PROFILER_HISTORY = 300  # Frames kept in the ring buffer
+PROFILER_MAX_EVENTS = 2000  # Trace events kept per frame (scope totals are always complete)
+PROFILER_GRAPH_FRAMES = 120
+PROFILER_TRACE_PATH = 'trace.json'
+
+# Snapshots: F5 saves to SNAPSHOT_PATH, F9 loads it, holding Backspace rewinds
+SNAPSHOT_PATH = 'quicksave.rpgs'
+REWIND_HISTORY = 450  # Snapshots kept for rewinding (0 turns recording off)
+REWIND_INTERVAL = 2  # Ticks between them, so 450 cover 30 seconds
+REWIND_BYTES = 64 * 1024 * 1024  # Cap on the memory they take; the oldest go first
+
+# Input logs (replay.py) hash the state every REPLAY_CHECKPOINT ticks to catch divergence
+REPLAY_CHECKPOINT = 600
+
+# Frames per second (FPS): cap on how often frames are drawn (0 = as fast as possible)
 FPS = 60
 
+# Simulation ticks per second; the game state always advances in fixed TICK steps.
+# 30 is the rate the original loop updated at (it ticked the clock twice per frame)
+TICK_RATE = 30
+TICK = 1 / TICK_RATE
+MAX_CATCHUP_TICKS = 5  # Most ticks run before a frame is drawn when rendering falls behind
+
 # Layer definitions
 HEALTH_LAYER = 6
 PLAYER_LAYER = 5
@@ -16,21 +51,85 @@ ENEMY_LAYER = 3
 BLOCKS_LAYER = 2
 GROUND_LAYER = 1
 
+# Row order of the direction animations in character spritesheets
+ANIMATION_ROWS = ('down', 'left', 'right', 'up')
+
+# Print spritesheet frame cache statistics on exit
+SHOW_STATS = False
+
 # Movement steps
-PLAYER_STEPS = 85 # Adjust speed as needed (200 pixels per second when use with dt)
-ENEMY_STEPS = 80
-BULLET_STEPS = 6
+PLAYER_STEPS = 120 # Pixels per second (4 per tick)
+PLAYER_ANIMATION_SPEED = 12  # Walk-cycle frames per second (the original loop updated the player twice a tick)
+ENEMY_STEPS = 30  # Pixels per second (1 per tick; enemy rects are whole pixels)
+BULLET_STEPS = 6  # Pixels per tick
 
 # Health values
 ENEMY_HEALTH = 6
 PLAYER_HEALTH = 10
 
+# Enemy wandering behaviour (counted in simulation ticks)
+ENEMY_NUMBER_STEPS = [30, 40, 50, 60, 70, 80, 90]  # Steps walked before stalling, one picked per enemy
+ENEMY_STALL_STEPS = 120
+ENEMY_COLLISION_REACTING_STEPS = 30
+
+ENEMY_DIRECTIONS = ('left', 'right', 'up', 'down')  # Order of the random direction choice
+
+# Enemies within NAV_RADIUS steps of the player follow a flow field toward it
+ENEMY_CHASE = True
+NAV_RADIUS = 16
+
+# Level of detail for sprite enemies (scheduler.py): every tick near the player, every
+# LOD_FAR_INTERVAL ticks within LOD_FAR_RADIUS tiles, not at all beyond that
+LOD_ENABLED = True
+LOD_NEAR_MARGIN = 2  # Tiles around the view
+LOD_FAR_RADIUS = 48  # Tiles
+LOD_FAR_INTERVAL = 8  # Ticks
+
+# Enemy behaviour a game can override per run (Game(enemy_params=...)), e.g. for parameter sweeps
+ENEMY_PARAMS = {
+    'steps': ENEMY_STEPS,
+    'number_steps': ENEMY_NUMBER_STEPS,
+    'stall_steps': ENEMY_STALL_STEPS,
+    'collision_reacting_steps': ENEMY_COLLISION_REACTING_STEPS,
+    'health': ENEMY_HEALTH,
+    'chase': ENEMY_CHASE,
+}
+
+# Run enemies as one NumPy structure-of-arrays system instead of a sprite each
+VECTORIZED_ENEMIES = False
+
+# Projectiles live in one preallocated pool
+PROJECTILE_CAPACITY = 4096
+PROJECTILE_LIFETIME = 120  # Ticks
+PROJECTILE_SIZE = 12  # Hit box in pixels
+WEAPON_COOLDOWN = 5  # Ticks between the player's shots (6 per second)
+DIRECTION_VECTORS = {'left': (-1, 0), 'right': (1, 0), 'up': (0, -1), 'down': (0, 1)}
+
 # Colors (RGB tuples)
 BLACK = (0, 0, 0)
 GREEN = (0, 255, 0)
 RED = (255, 0, 0)
 BG_COLOR = (50, 50, 50)
 
+# Frames cut from spritesheets are cached here as raw pixels (assets.py)
+ASSET_CACHE_DIR = 'assets/cache'
+
+# Terrain spritesheet positions (ground is drawn under every tile)
+GROUND_TILE = (447, 352)
+TILE_IMAGES = {
+    'B': (991, 542),
+}
+
+# Tile flags in the passability grid
+TILE_SOLID = 1
+TILE_WATER = 2
+TILE_ROCK = 4
+TILE_FLAGS = {
+    'B': TILE_SOLID,
+    'W': TILE_WATER,
+    'R': TILE_ROCK,
+}
+
 # Tilemap layout
 WORLD_MAP = [
     'BBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBBB',
@@ -0,0 +1,353 @@
+"""Compact binary snapshots of the simulation, for save, load and rewind.
+
+A snapshot holds everything the next update depends on: the tick, the RNG,
+the player, the tiles, every enemy and every projectile. Images, groups,
+the spatial hash and the flow field are rebuilt from that on restore.
+Enemy parameters (Game(enemy_params=...)) are configuration, not state, so
+a snapshot should be restored into a game made with the same ones.
+Layout (little-endian):
+
+    header       HEADER
+    rng          RNG (Mersenne Twister words and gauss_next)
+    player       PLAYER
+    tiles        cols * rows tile IDs
+    enemies      ENEMY records (sprite enemies) or SYSTEM records (EnemySystem)
+    projectiles  live slot numbers (int32), their PROJECTILE records, then the free-slot stack (int32)
+                 above its untouched bottom, which still holds the pool's initial order
+"""
+import struct, zlib
+from collections import deque
+from operator import attrgetter, itemgetter
+import numpy as np
+from settings import *
+from sprites import Enemy
+from entities import STATES
+
+MAGIC = b'RPGS'
+VERSION = 2
+HEADER = struct.Struct('<4sHIIIIIIIIB')  # magic, version, tick, enemies spawned, input state, cols, rows, enemies, projectiles, untouched free slots, flags
+RNG = struct.Struct('<625I?d')  # Generator state words, whether gauss_next is set, gauss_next
+PLAYER = struct.Struct('<iiiiddBdBi')  # x, y, previous x, previous y, direction x, y, current direction, animation counter, image, weapon ready_in
+
+VECTORIZED = 1  # Header flag: enemies are SYSTEM records
+
+ENEMY = np.dtype([
+    ('spawn_order', '<u4'), ('x', '<i4'), ('y', '<i4'), ('previous_x', '<i4'), ('previous_y', '<i4'),
+    ('direction', 'u1'), ('state', 'u1'), ('moving', '?'), ('image', 'u1'),
+    ('number_steps', '<i4'), ('current_steps', '<i4'), ('collision_reaction_counter', '<i4'),
+    ('animation_counter', '<f8'), ('health', '<i4'), ('updated_tick', '<u4'),
+])
+SYSTEM = np.dtype([
+    ('x', '<i4'), ('y', '<i4'), ('previous_x', '<i4'), ('previous_y', '<i4'), ('direction', 'i1'), ('state', 'i1'),
+    ('number_steps', '<i4'), ('current_steps', '<i4'), ('collision_reaction_counter', '<i4'),
+    ('animation_counter', '<f8'), ('health', '<i4'), ('frame', 'i1'), ('frame_direction', 'i1'),
+])
+PROJECTILE = np.dtype([('x', '<f8'), ('y', '<f8'), ('vx', '<f8'), ('vy', '<f8'), ('life', '<i4')])
+
+def image_codes(animations):
+    """Numbers every frame of an animation table, so an entity's current image packs into one byte."""
+    frames = [frame for direction in ANIMATION_ROWS for frame in animations[direction]]
+    return frames, {frame: code for code, frame in enumerate(frames)}
+
+# ENEMY fields that are plain Enemy attributes
+ENEMY_ATTRIBUTES = [name for name in ENEMY.names if name not in ('x', 'y', 'previous_x', 'previous_y', 'image')]
+
+def enemy_records(game, enemies):
+    """ENEMY records of a list of sprite enemies, read a field at a time rather than a tuple per enemy."""
+    _, codes = image_codes(game.enemy_spritesheet.get_animations())
+    count = len(enemies)
+    records = np.empty(count, ENEMY)
+    rects = [enemy.rect for enemy in enemies]
+    previous = [enemy.previous_pos for enemy in enemies]
+    records['x'] = np.fromiter(map(attrgetter('x'), rects), np.int32, count)
+    records['y'] = np.fromiter(map(attrgetter('y'), rects), np.int32, count)
+    records['previous_x'] = np.fromiter(map(itemgetter(0), previous), np.int32, count)
+    records['previous_y'] = np.fromiter(map(itemgetter(1), previous), np.int32, count)
+    records['image'] = np.fromiter(map(codes.__getitem__, map(attrgetter('image'), enemies)), np.uint8, count)
+    for name in ENEMY_ATTRIBUTES:
+        records[name] = np.fromiter(map(attrgetter(name), enemies), ENEMY[name], count)
+    return records
+
+class EnemyRecords:
+    """A game's sprite enemies as ENEMY records, kept up to date incrementally.
+
+    Enemies only change in update(), which stamps updated_tick, except for
+    health (hits) and group membership (spawns and deaths). So when the
+    enemies are the same as last time, build() re-reads every enemy's health
+    but the other fields only of enemies updated since; with the LOD
+    scheduler that is the few near the player. restore() hands the records it
+    applied back with set()."""
+    def __init__(self):
+        self.enemies = None  # Enemy objects, in group order, that `records` describe
+        self.records = None
+        self.tick = 0  # Game tick the records are from
+
+    def build(self, game):
+        enemies = game.enemies.sprites()
+        if self.records is None or enemies != self.enemies:  # List equality: same objects, same order
+            records = enemy_records(game, enemies)
+        else:
+            records = self.records
+            updated = np.fromiter(map(attrgetter('updated_tick'), enemies), np.uint32, len(enemies))
+            fresh = np.flatnonzero(updated > self.tick)
+            if len(fresh):
+                records[fresh] = enemy_records(game, [enemies[i] for i in fresh.tolist()])
+            records['health'] = np.fromiter(map(attrgetter('health'), enemies), np.int32, len(enemies))
+        self.set(enemies, records, game.tick)
+        return records
+
+    def set(self, enemies, records, tick):
+        self.enemies = enemies
+        self.records = records
+        self.tick = tick
+
+def save(game):
+    """Returns a snapshot of the game's current state as bytes."""
+    if game.chunk_manager:
+        raise ValueError("streamed worlds can't be snapshotted yet; their tiles live in the world file")
+    player = game.player
+    system = game.enemy_system
+
+    if system:
+        enemies = np.empty(len(system), SYSTEM)
+        for name in SYSTEM.names:
+            enemies[name] = getattr(system, name)
+    else:
+        enemies = game.enemy_records.build(game)
+
+    pool = game.projectiles
+    live = np.flatnonzero(pool.alive).astype('<i4')
+    projectiles = np.empty(len(live), PROJECTILE)
+    for name in PROJECTILE.names:
+        projectiles[name] = getattr(pool, name)[live]
+    free = pool.free[:pool.free_count]
+    changed = np.flatnonzero(free != np.arange(pool.capacity - 1, pool.capacity - 1 - len(free), -1))
+    untouched = changed[0] if len(changed) else len(free)
+
+    version, words, gauss_next = game.rng.getstate()
+    _, codes = image_codes(player.animations)
+    parts = [
+        HEADER.pack(MAGIC, VERSION, game.tick, game.enemies_spawned, game.input_state, game.grid.cols, game.grid.rows,
+                    len(enemies), len(live), untouched, VECTORIZED if system else 0),
+        RNG.pack(*words, gauss_next is not None, gauss_next or 0.0),
+        PLAYER.pack(player.rect.x, player.rect.y, *player.previous_pos, player.direction.x, player.direction.y,
+                    ANIMATION_ROWS.index(player.current_direction), player.animation_counter,
+                    codes[player.image], player.weapon.ready_in),
+        bytes(game.terrain.tiles),
+        enemies.tobytes(),
+        live.tobytes(),
+        projectiles.tobytes(),
+        free[untouched:].astype('<i4').tobytes(),
+    ]
+    return b''.join(parts)
+
+def restore(game, data):
+    """Puts the game back into the state saved in `data`, reusing live sprites where it can.
+    Raises ValueError, leaving the game as it was, if `data` doesn't fit it."""
+    if len(data) < HEADER.size:
+        raise ValueError("not a snapshot")
+    (magic, version, tick, enemies_spawned, input_state, cols, rows,
+     enemy_count, projectile_count, untouched, flags) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a snapshot")
+    if version != VERSION:
+        raise ValueError(f"snapshot format version {version}, expected {VERSION}")
+    if (cols, rows) != (game.grid.cols, game.grid.rows):
+        raise ValueError(f"snapshot is of a {cols}x{rows} map, the game has {game.grid.cols}x{game.grid.rows}")
+    if bool(flags & VECTORIZED) != bool(game.enemy_system):
+        raise ValueError("snapshot and game disagree on vectorized enemies")
+    pool = game.projectiles
+    if projectile_count + untouched > pool.capacity:
+        raise ValueError(f"snapshot has {projectile_count} projectiles and {untouched} untouched slots, the pool {pool.capacity}")
+    size = (HEADER.size + RNG.size + PLAYER.size + cols * rows + (SYSTEM if flags & VECTORIZED else ENEMY).itemsize * enemy_count
+            + (4 + PROJECTILE.itemsize) * projectile_count + 4 * (pool.capacity - projectile_count - untouched))
+    if len(data) != size:
+        raise ValueError(f"snapshot is {len(data)} bytes, its header says {size}")
+
+    # Read and check everything before changing anything
+    offset = HEADER.size
+    rng = RNG.unpack_from(data, offset)
+    offset += RNG.size
+    x, y, previous_x, previous_y, direction_x, direction_y, current_direction, animation_counter, image, ready_in = PLAYER.unpack_from(data, offset)
+    offset += PLAYER.size
+    tiles = data[offset:offset + cols * rows]
+    offset += cols * rows
+    records = np.frombuffer(data, SYSTEM if flags & VECTORIZED else ENEMY, enemy_count, offset)
+    offset += records.nbytes
+    live = np.frombuffer(data, '<i4', projectile_count, offset)
+    offset += live.nbytes
+    projectiles = np.frombuffer(data, PROJECTILE, projectile_count, offset)
+    offset += projectiles.nbytes
+    free = np.frombuffer(data, '<i4', pool.capacity - projectile_count - untouched, offset)
+
+    player_frames, _ = image_codes(game.player.animations)
+    check_codes("RNG position", [rng[624]], 625)
+    check_codes("player direction", [current_direction], len(ANIMATION_ROWS))
+    check_codes("player image", [image], len(player_frames))
+    check_codes("enemy direction", records['direction'], len(ENEMY_DIRECTIONS))
+    check_codes("enemy state", records['state'], len(STATES))
+    if game.enemy_system:
+        check_codes("enemy frame direction", records['frame_direction'], len(ENEMY_DIRECTIONS))
+        check_codes("enemy frame", records['frame'], min(map(len, game.enemy_system.frames)))
+    else:
+        check_codes("enemy image", records['image'], len(image_codes(game.enemy_spritesheet.get_animations())[0]))
+    check_codes("projectile slot", live, pool.capacity)
+    check_codes("free projectile slot", free, pool.capacity)
+
+    # Tiles first: everything else may collide with them
+    if tiles != game.terrain.tiles:
+        game.terrain.tiles[:] = tiles
+        game.grid.flags[:] = tiles.translate(game.grid.flag_table)  # In place: the enemy system views these bytes
+        for chunk in list(game.terrain.chunks):
+            game.terrain.forget_chunk(*chunk)
+    if game.navigation:
+        game.navigation.invalidate()
+
+    player = game.player
+    player.rect.topleft = (x, y)
+    player.hitbox_rect.topleft = (x, y)
+    player.previous_pos = (previous_x, previous_y)
+    player.direction.update(direction_x, direction_y)
+    player.current_direction = ANIMATION_ROWS[current_direction]
+    player.animation_counter = animation_counter
+    player.image = player_frames[image]
+    player.weapon.ready_in = ready_in
+    game.spatial.move(player)
+
+    if game.enemy_system:
+        for name in SYSTEM.names:
+            setattr(game.enemy_system, name, records[name].astype(getattr(game.enemy_system, name).dtype))
+    else:
+        restore_enemies(game, records, tick)
+
+    pool.alive[:] = False
+    pool.vx[:] = 0  # Free slots have zero velocity
+    pool.vy[:] = 0
+    for name in PROJECTILE.names:
+        getattr(pool, name)[live] = projectiles[name]
+    pool.alive[live] = True
+    pool.free_count = pool.capacity - projectile_count
+    pool.free[:untouched] = np.arange(pool.capacity - 1, pool.capacity - 1 - untouched, -1)
+    pool.free[untouched:pool.free_count] = free
+
+    game.tick = tick
+    game.enemies_spawned = enemies_spawned
+    game.input_state = input_state
+    game.rng.setstate((3, rng[:625], rng[626] if rng[625] else None))
+
+def check_codes(name, values, count):
+    """Raises ValueError unless every value is a valid index below `count`."""
+    values = np.asarray(values)
+    if len(values) and (values.min() < 0 or values.max() >= count):
+        raise ValueError(f"snapshot has a bad {name}")
+
+def restore_enemy(game, enemy, record, frames):
+    (_, x, y, previous_x, previous_y, direction, state, moving, image,
+     number_steps, current_steps, collision_reaction_counter, animation_counter, health, updated_tick) = record
+    enemy.rect.topleft = (x, y)
+    enemy.previous_pos = (previous_x, previous_y)
+    enemy.direction = direction
+    enemy.state = state
+    enemy.moving = moving
+    enemy.image = frames[image]
+    enemy.number_steps = number_steps
+    enemy.current_steps = current_steps
+    enemy.collision_reaction_counter = collision_reaction_counter
+    enemy.animation_counter = animation_counter
+    enemy.health = health
+    enemy.updated_tick = updated_tick
+    game.spatial.move(enemy)
+
+def restore_enemies(game, records, tick):
+    """Updates sprite enemies from ENEMY records: survivors are reused, dead ones come back, extra ones die.
+    When the same enemies are alive, only those whose record differs are touched."""
+    frames, _ = image_codes(game.enemy_spritesheet.get_animations())
+    current = game.enemy_records.build(game)
+    enemies = game.enemy_records.enemies
+    if len(current) == len(records) and (current['spawn_order'] == records['spawn_order']).all():
+        changed = np.flatnonzero(current != records)
+        for i, record in zip(changed.tolist(), records[changed].tolist()):
+            restore_enemy(game, enemies[i], record, frames)
+    else:
+        existing = {enemy.spawn_order: enemy for enemy in enemies}
+        enemies = []
+        for record in records.tolist():
+            enemy = existing.pop(record[0], None)
+            if enemy is None:
+                enemy = Enemy(game, 0, 0)  # Its random draws and spawn count are overwritten below
+                enemy.spawn_order = record[0]
+            restore_enemy(game, enemy, record, frames)
+            enemies.append(enemy)
+
+        for enemy in existing.values():  # Spawned after the snapshot
+            enemy.kill()
+        if game.enemies.sprites() != enemies:
+            # Revived enemies were appended; put every group back in spawn (update) order
+            game.enemies.remove(*enemies)
+            game.enemies.add(*enemies)
+    game.enemy_records.set(enemies, records.copy(), tick)
+
+DELTA = struct.Struct('<I')  # Length of the older snapshot, ahead of a History delta
+
+def delta(new, old):
+    """Reverse delta that patch() turns `new` back into `old` with: old's length, then zlib of old XOR new
+    over their common length plus the rest of old. Consecutive snapshots are mostly equal bytes, so it is small."""
+    common = min(len(new), len(old))
+    xor = np.bitwise_xor(np.frombuffer(old, np.uint8, common), np.frombuffer(new, np.uint8, common))
+    return DELTA.pack(len(old)) + zlib.compress(xor.tobytes() + old[common:], 1)
+
+def patch(new, delta):
+    """The snapshot `delta` was made against, from `new`."""
+    length, = DELTA.unpack_from(delta)
+    body = zlib.decompress(delta[DELTA.size:])
+    common = min(len(new), length)
+    xor = np.bitwise_xor(np.frombuffer(body, np.uint8, common), np.frombuffer(new, np.uint8, common))
+    return xor.tobytes() + body[common:]
+
+class History:
+    """Recent snapshots, for rewinding: the latest in full, each older one as a delta from the one after it.
+    Kept to at most `size` snapshots and `max_bytes` in total, dropping the oldest first."""
+    def __init__(self, game, size=REWIND_HISTORY, interval=REWIND_INTERVAL, max_bytes=REWIND_BYTES):
+        self.game = game
+        self.latest = None  # Bytes of the most recent snapshot
+        self.deltas = deque()  # Oldest first; deltas[-1] turns latest into the snapshot before it
+        self.size = size
+        self.interval = interval  # Ticks between snapshots
+        self.max_bytes = max_bytes
+        self.bytes = 0  # Held by latest and the deltas
+
+    def __len__(self):
+        return len(self.deltas) + (self.latest is not None)
+
+    def clear(self):
+        self.latest = None
+        self.deltas.clear()
+        self.bytes = 0
+
+    def record(self):
+        """Snapshots the game if it is on a recording tick."""
+        if not self.size or self.game.tick % self.interval:
+            return
+        data = save(self.game)
+        if self.latest is not None:
+            self.deltas.append(delta(data, self.latest))
+            self.bytes += len(self.deltas[-1]) - len(self.latest)
+        self.latest = data
+        self.bytes += len(data)
+        while self.deltas and (len(self) > self.size or self.bytes > self.max_bytes):
+            self.bytes -= len(self.deltas.popleft())
+
+    def rewind(self):
+        """Restores the most recent snapshot and drops it; returns False when there is none left."""
+        if self.latest is None:
+            return False
+        restore(self.game, self.latest)
+        self.bytes -= len(self.latest)
+        if self.deltas:
+            older = self.deltas.pop()
+            self.bytes -= len(older)
+            self.latest = patch(self.latest, older)
+            self.bytes += len(self.latest)
+        else:
+            self.latest = None
+        return True
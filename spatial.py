@@ -0,0 +1,71 @@
+from settings import *
+from profiler import profiler
+
+class SpatialHash:
+    """Uniform grid of buckets for broadphase queries between moving entities.
+
+    Entities are anything with a `rect`. They register with insert(), call
+    move() after changing position, and remove() when they die. Buckets are
+    dicts so query results come back in a deterministic order."""
+    def __init__(self, cell_size=SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> {entity: None}
+        self.entity_cells = {}  # entity -> (first_x, first_y, last_x, last_y) it is registered in
+
+    def cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, entity):
+        cells = self.cell_range(entity.rect)
+        self.entity_cells[entity] = cells
+        first_x, first_y, last_x, last_y = cells
+        for cell_y in range(first_y, last_y + 1):
+            for cell_x in range(first_x, last_x + 1):
+                self.cells.setdefault((cell_x, cell_y), {})[entity] = None
+
+    def remove(self, entity):
+        cells = self.entity_cells.pop(entity, None)
+        if cells is None:
+            return
+        first_x, first_y, last_x, last_y = cells
+        for cell_y in range(first_y, last_y + 1):
+            for cell_x in range(first_x, last_x + 1):
+                bucket = self.cells[(cell_x, cell_y)]
+                del bucket[entity]
+                if not bucket:
+                    del self.cells[(cell_x, cell_y)]
+
+    def move(self, entity):
+        """Re-registers an entity whose rect changed; cheap when it stayed within the same cells."""
+        if self.entity_cells.get(entity) != self.cell_range(entity.rect):
+            self.remove(entity)
+            self.insert(entity)
+
+    def candidates(self, rect):
+        """Entities registered in the cells `rect` covers, without an overlap test."""
+        found = {}
+        cells = self.cells
+        first_x, first_y, last_x, last_y = self.cell_range(rect)
+        for cell_y in range(first_y, last_y + 1):
+            for cell_x in range(first_x, last_x + 1):
+                bucket = cells.get((cell_x, cell_y))
+                if bucket:
+                    found.update(bucket)
+        return found
+
+    def query(self, rect, group=None):
+        """Returns the entities whose rect overlaps `rect`, optionally only those in `group`."""
+        candidates = self.candidates(rect)
+        profiler.count('entity tests', len(candidates))
+        return [
+            entity for entity in candidates
+            if (group is None or group.has_internal(entity)) and rect.colliderect(entity.rect)
+        ]
+
+    def pairs(self, entities, group=None):
+        """Yields every colliding (entity, other) pair between `entities` and the hash contents."""
+        for entity in entities:
+            for other in self.query(entity.rect, group):
+                if other is not entity:
+                    yield entity, other
@@ -1,38 +1,106 @@
-import math
-import pygame, random
+import math, time
+import pygame
 from settings import *
+import assets
+from controls import *
+from weapon import Weapon
+from entities import *
+from profiler import profiler
 from pygame.sprite import LayeredUpdates
 
 class Spritesheet:
-    """Loads and extracts images from a spritesheet."""
+    """Hands out shared, pre-converted frames of a spritesheet.
+
+    Frames saved in the sheet's asset pack (assets.py) are ready at once, and
+    the PNG is only decoded, on a background thread, when there is no pack or
+    a frame outside it is asked for. A frame asked for before the PNG is ready
+    starts out blank and poll() later fills it in place, so whatever already
+    holds it shows the real image from then on."""
     def __init__(self, path):
-        self.spritesheet = pygame.image.load(path).convert()
+        self.path = path
+        self.frames = assets.read_pack(path)  # (x, y, width, height, colorkey) -> shared frame
+        self.loading = None if self.frames else assets.load_image(path)  # Future of the decoded PNG
+        self.spritesheet = None  # The converted PNG, once loaded
+        self.packed = len(self.frames)  # Frames in the pack on disk
+        self.blank = []  # Keys of frames still waiting for the PNG
+        self.animations = {}  # (frame count, width, height) -> shared animation table
+        self.hits = 0
+        self.misses = 0
+
+    def get_image(self, x, y, width, height, colorkey=BLACK):
+        """Extracts a single sprite from the spritesheet.
+
+        Frames are cut once per rect and colorkey and shared by every caller,
+        so they must not be drawn on."""
+        key = (x, y, width, height, colorkey)
+        sprite = self.frames.get(key)
+        if sprite is not None:
+            self.hits += 1
+            return sprite
 
-    def get_image(self, x, y, width, height):
-        """Extracts a single sprite from the spritesheet."""
-        sprite = pygame.Surface((width, height), pygame.SRCALPHA)
-        sprite.blit(self.spritesheet, (0, 0), (x, y, width, height))
-        sprite.set_colorkey(BLACK)
+        self.misses += 1
+        profiler.count('surfaces allocated')
+        if self.loading is None:
+            self.loading = assets.load_image(self.path)
+        if self.spritesheet is None and self.loading.done():
+            self.finish()
+        if self.spritesheet is not None:
+            sprite = self.spritesheet.subsurface((x, y, width, height)).copy()  # Keeps the display format
+        else:
+            sprite = pygame.Surface((width, height)).convert()
+            sprite.fill(colorkey or BLACK)  # Invisible until filled, if colorkeyed
+            self.blank.append(key)
+        if colorkey is not None:
+            sprite.set_colorkey(colorkey, pygame.RLEACCEL)
+        self.frames[key] = sprite
         return sprite
 
-class Ground(pygame.sprite.Sprite):
-    def __init__(self, game, x, y):
-        super().__init__(game.all_sprites)  # Add to the main sprite group
-        self.width = TILESIZE
-        self.height = TILESIZE
-        self.image = game.terrain_spritesheet.get_image(447, 352, self.width, self.height)
-        self.rect = self.image.get_rect(topleft=(x * self.width, y * self.height))
+    def finish(self):
+        """Converts the decoded PNG and fills in the frames handed out blank."""
+        self.spritesheet = self.loading.result().convert()
+        for key in self.blank:
+            x, y, width, height, colorkey = key
+            self.frames[key].blit(self.spritesheet, (0, 0), (x, y, width, height))
+        self.blank = []
+
+    def poll(self):
+        """Call once per frame. Finishes loading if the PNG is ready and keeps the pack up to date;
+        returns True when that filled in blank frames."""
+        filled = False
+        if self.spritesheet is None:
+            if self.loading is None or not self.loading.done():
+                return False
+            filled = bool(self.blank)
+            self.finish()
+        if len(self.frames) != self.packed:
+            assets.write_pack(self.path, self.frames)
+            self.packed = len(self.frames)
+        return filled
+
+    def wait(self):
+        """Blocks until any PNG being loaded is in, e.g. so headless runs never see a blank frame."""
+        if self.loading:
+            self.loading.result()
+        return self.poll()
+
+    def get_animations(self, frame_count=3, width=TILESIZE, height=TILESIZE):
+        """Returns the {direction: [frames]} table of a character sheet, shared by every entity using it."""
+        key = (frame_count, width, height)
+        animations = self.animations.get(key)
+        if animations is None:
+            animations = {
+                direction: [self.get_image(i * width, row * height, width, height) for i in range(frame_count)]
+                for row, direction in enumerate(ANIMATION_ROWS)
+            }
+            self.animations[key] = animations
+        return animations
+
+    def stats(self):
+        return {'frames': len(self.frames), 'hits': self.hits, 'misses': self.misses, 'packed': self.packed}
 
-class Block(Ground):
-    def __init__(self, game, x, y):
-        super().__init__(game, x, y)
-        self.width = TILESIZE
-        self.height = TILESIZE
-        self.image = game.terrain_spritesheet.get_image(991, 542, self.width, self.height)  # Different tile for block
-        self.rect = self.image.get_rect(topleft=(x * self.width, y * self.height))
-        
 class Player(pygame.sprite.Sprite): 
     def __init__(self, game, x, y):
+        self._layer = PLAYER_LAYER  # Read by LayeredUpdates when added
         super().__init__(game.all_sprites)  # Add to all_sprites group
         game.player_group.add(self)  # Add player separately
         self.width = TILESIZE
@@ -42,6 +110,8 @@ class Player(pygame.sprite.Sprite):
         self.image = game.player_spritesheet.get_image(0, 0, self.width, self.height)
         self.rect = self.image.get_rect(topleft=(x * self.width, y * self.height))
         self.hitbox_rect = self.rect.copy()
+        self.previous_pos = self.rect.topleft  # Position at the start of the tick, for render interpolation
+        game.spatial.insert(self)
         
         # Movement attributes
         self.direction = pygame.math.Vector2(0, 0)  # Movement vector (x, y)
@@ -49,82 +119,67 @@ class Player(pygame.sprite.Sprite):
         self.player_steps = PLAYER_STEPS
         
         self.animation_counter = 0
-        self.collision_sprites = game.blocks  # Use the game's block group
+        self.collision_grid = game.grid  # Static walls
         
-        # Animation frames for each direction
-        self.animations = {
-            "down": [
-                self.game.player_spritesheet.get_image(0, 0, self.width, self.height),
-                self.game.player_spritesheet.get_image(32, 0, self.width, self.height),
-                self.game.player_spritesheet.get_image(64, 0, self.width, self.height)
-            ],
-            "left": [
-                self.game.player_spritesheet.get_image(0, 32, self.width, self.height),
-                self.game.player_spritesheet.get_image(32, 32, self.width, self.height),
-                self.game.player_spritesheet.get_image(64, 32, self.width, self.height)
-            ],
-            "right": [
-                self.game.player_spritesheet.get_image(0, 64, self.width, self.height),
-                self.game.player_spritesheet.get_image(32, 64, self.width, self.height),
-                self.game.player_spritesheet.get_image(64, 64, self.width, self.height)
-            ],
-            "up": [
-                self.game.player_spritesheet.get_image(0, 96, self.width, self.height),
-                self.game.player_spritesheet.get_image(32, 96, self.width, self.height),
-                self.game.player_spritesheet.get_image(64, 96, self.width, self.height)
-            ]
-        }
+        # Animation frames for each direction (shared by every Player)
+        self.animations = game.player_spritesheet.get_animations()
+        self.weapon = Weapon(game)
         
     def move(self, dt):
-        pressed = pygame.key.get_pressed()  # Get current state of all keys
+        held = self.game.input_state  # Controls held this tick
 
         # Reset direction
         self.direction.x = 0
         self.direction.y = 0
 
         # Detect movement based on key presses
-        if pressed[pygame.K_LEFT] or pressed[pygame.K_a]:
+        if held & INPUT_LEFT:
             self.direction.x = -self.player_steps * dt
             self.current_direction = "left"
-        elif pressed[pygame.K_RIGHT] or pressed[pygame.K_d]:
+        elif held & INPUT_RIGHT:
             self.direction.x = self.player_steps * dt
             self.current_direction = "right"            
-        elif pressed[pygame.K_UP] or pressed[pygame.K_w]:
+        elif held & INPUT_UP:
             self.direction.y = -self.player_steps * dt
             self.current_direction = "up"   
-        elif pressed[pygame.K_DOWN] or pressed[pygame.K_s]:
+        elif held & INPUT_DOWN:
             self.direction.y = self.player_steps * dt
             self.current_direction = "down"
 
     def update(self, dt):
+        self.previous_pos = self.rect.topleft
+
         # Handle player movement (first)
         self.move(dt)  # Update movement based on key press
         
         # Check for collisions with blocks (before updating the position)
-        self.hitbox_rect.x += round(self.direction.x)
-        self.collide_block("horizontal")  # Collide in horizontal direction
-        
-        self.hitbox_rect.y += round(self.direction.y)
-        self.collide_block("vertical")   # Collide in vertical direction
+        with profiler.scope('collide_block'):
+            self.hitbox_rect.x += round(self.direction.x)
+            self.collide_block("horizontal")  # Collide in horizontal direction
+            
+            self.hitbox_rect.y += round(self.direction.y)
+            self.collide_block("vertical")   # Collide in vertical direction
 
-        self.hitbox_rect.x += round(self.direction.x)
-        self.collide_enemy("horizontal")  # Collide in horizontal direction
-        
-        self.hitbox_rect.y += round(self.direction.y)
-        self.collide_enemy("vertical")   # Collide in vertical direction
+        with profiler.scope('collide_enemy'):
+            # The hitbox has already moved; enemies only push it back
+            self.collide_enemy("horizontal")  # Collide in horizontal direction
+            self.collide_enemy("vertical")   # Collide in vertical direction
         
         # Update player rect position after handling collisions
         self.rect.topleft = self.hitbox_rect.topleft  # Update sprite position
+        self.game.spatial.move(self)
         
         # Animate the player if moving
-        self.animation()
+        self.animation(dt)
+
+        self.weapon.update(self.game.input_state & INPUT_FIRE, self.rect.center, self.current_direction)
             
-    def animation(self):
+    def animation(self, dt):
         # Check if the player is moving (has a non-zero direction)
         if self.direction.x != 0 or self.direction.y != 0:
             animation = self.animations[self.current_direction]
             self.image = animation[int(self.animation_counter)]
-            self.animation_counter += 0.2  # Increment animation frame counter when moving
+            self.animation_counter += PLAYER_ANIMATION_SPEED * dt  # Increment animation frame counter when moving
             
             if self.animation_counter >= len(animation):
                 self.animation_counter = 0
@@ -139,50 +194,40 @@ class Player(pygame.sprite.Sprite):
         next_hitbox_rect.x += round(self.direction.x)
         next_hitbox_rect.y += round(self.direction.y)
     
-        collideBlock = pygame.sprite.spritecollide(self, self.game.blocks, False, pygame.sprite.collide_rect_ratio(0.75))
+        # Same test as collide_rect_ratio(0.75) on both rects: shrink ours by both margins
+        collideBlock = self.collision_grid.hits(self.rect.inflate(-TILESIZE // 2, -TILESIZE // 2))
 
         if collideBlock:
-            # Initialize a list to hold the distance of each corner
-            overlap_distances = []
-
             # Check distances for the corners of the player's hitbox
             corners = [
-                (self.hitbox_rect.topleft, "top left"),
-                (self.hitbox_rect.topright, "top right"),
-                (self.hitbox_rect.bottomleft, "bottom left"),
-                (self.hitbox_rect.bottomright, "bottom right")
+                self.hitbox_rect.topleft,
+                self.hitbox_rect.topright,
+                self.hitbox_rect.bottomleft,
+                self.hitbox_rect.bottomright
             ]
 
-            for corner, position in corners:
-                for sprite in collideBlock:
-                    # Calculate the distance between the corner and the block
-                    dist_x = corner[0] - sprite.rect.centerx
-                    dist_y = corner[1] - sprite.rect.centery
-                    distance = math.sqrt(dist_x**2 + dist_y**2)
-                    overlap_distances.append((distance, position, sprite))
-
-            # Sort by distance to find the closest collision
-            overlap_distances.sort(key=lambda x: x[0])
-
-            # Now handle the closest overlap
-            closest = overlap_distances[0]  # Get the closest collision
-            _, position, sprite = closest
+            # Find the block closest to any corner
+            _, block = min(
+                ((math.hypot(corner[0] - rect.centerx, corner[1] - rect.centery), rect)
+                 for corner in corners for rect in collideBlock),
+                key=lambda x: x[0]
+            )
 
             # Handle collision based on the closest overlap
             if direction == "horizontal":
                 if self.direction.x > 0:  # Moving right
-                    self.hitbox_rect.right = sprite.rect.left
+                    self.hitbox_rect.right = block.left
                     self.direction.x = 0
                 elif self.direction.x < 0:  # Moving left
-                    self.hitbox_rect.left = sprite.rect.right
+                    self.hitbox_rect.left = block.right
                     self.direction.x = 0
 
             elif direction == "vertical":
                 if self.direction.y > 0:  # Moving down
-                    self.hitbox_rect.bottom = sprite.rect.top
+                    self.hitbox_rect.bottom = block.top
                     self.direction.y = 0
                 elif self.direction.y < 0:  # Moving up
-                    self.hitbox_rect.top = sprite.rect.bottom
+                    self.hitbox_rect.top = block.bottom
                     self.direction.y = 0
 
         else:
@@ -190,129 +235,167 @@ class Player(pygame.sprite.Sprite):
             self.player_step = PLAYER_STEPS
 
     def collide_enemy(self, direction):
-        collideBlock = pygame.sprite.spritecollide(self, self.game.enemies, False, pygame.sprite.collide_rect_ratio(0.75))
+        # Only enemies in nearby cells; same 0.75 rect-ratio test as the block collision
+        collideBlock = self.game.enemy_rects(self.rect.inflate(-TILESIZE // 2, -TILESIZE // 2))
 
         if collideBlock:
                 # Handle collision based on the closest overlap
-                for sprite in collideBlock:  # Loop through the colliding enemies
+                for enemy in collideBlock:  # Loop through the colliding enemies' rects
                     if direction == "horizontal":
                         if self.direction.x >= 0:  # Moving right
-                            self.hitbox_rect.right = sprite.rect.left
+                            self.hitbox_rect.right = enemy.left
                         elif self.direction.x <= 0:  # Moving left
-                            self.hitbox_rect.left = sprite.rect.right
+                            self.hitbox_rect.left = enemy.right
 
                     elif direction == "vertical":
                         if self.direction.y >= 0:  # Moving down
-                            self.hitbox_rect.bottom = sprite.rect.top
+                            self.hitbox_rect.bottom = enemy.top
                         elif self.direction.y <= 0:  # Moving up
-                            self.hitbox_rect.top = sprite.rect.bottom
+                            self.hitbox_rect.top = enemy.bottom
+
+class EnemyKind(Kind):
+    """What every Enemy in a game shares: frames, layer and the game's ENEMY_PARAMS."""
+    def __init__(self, game):
+        animations = game.enemy_spritesheet.get_animations()
+        super().__init__(game, ENEMY_LAYER, [animations[name] for name in ENEMY_DIRECTIONS])
+        params = game.enemy_params  # ENEMY_PARAMS, possibly overridden for this game
+        self.speed = params['steps']
+        self.number_steps = params['number_steps']  # One picked per enemy
+        self.stall_steps = params['stall_steps']  # Regular stalling steps
+        self.collision_reacting_steps = params['collision_reacting_steps']  # Reacting steps when colliding
+        self.health = params['health']
+        self.collide_seconds = 0.0  # Wall collision time of the enemies updated since report_collisions()
+        self.collide_calls = 0
+
+    def report_collisions(self):
+        """Hands the summed wall collision time of a pass of enemy updates to the profiler,
+        under the 'collide_block' scope the player and the enemy system use too."""
+        if self.collide_calls:
+            profiler.add('collide_block', self.collide_seconds, self.collide_calls)
+            self.collide_seconds = 0.0
+            self.collide_calls = 0
+
+class Enemy(Entity):
+    __slots__ = (
+        'spawn_order', 'updated_tick', 'image', 'rect', 'previous_pos', 'x_change', 'y_change',
+        'animation_counter', 'direction', 'state', 'number_steps', 'current_steps',
+        'collision_reaction_counter', 'moving', 'health',
+    )
 
-class Enemy(pygame.sprite.Sprite):
     def __init__(self, game, x, y):
-        super().__init__(game.all_sprites, game.enemies)  
-        self.width = TILESIZE
-        self.height = TILESIZE        
-        
-        self.game = game
-        self.image = game.enemy_spritesheet.get_image(0, 0, self.width, self.height)
-        self.rect = self.image.get_rect(topleft=(x * self.width, y * self.height))
+        kind = game.enemy_kind
+        super().__init__(kind, game.enemies)  # Drawn and scheduled through the spatial hash, not all_sprites
+
+        self.spawn_order = game.enemies_spawned
+        game.enemies_spawned += 1
+        self.updated_tick = game.tick  # Last tick this enemy was updated on, for the LOD scheduler
+        self.image = kind.frames[DOWN][0]
+        self.rect = self.image.get_rect(topleft=(x * TILESIZE, y * TILESIZE))
+        self.previous_pos = self.rect.topleft  # Position at the start of the tick, for render interpolation
+        game.spatial.insert(self)
 
         self.x_change = 0
         self.y_change = 0
         self.animation_counter = 1
-        self.direction = random.choice(['left', 'right', 'up', 'down'])
-        self.state = "moving"
-        self.number_steps = random.choice([30, 40, 50, 60, 70, 80, 90])
-        self.stall_steps = 120  # Regular stalling steps
+        self.direction = game.rng.choice(range(len(ENEMY_DIRECTIONS)))
+        self.state = MOVING
+        self.number_steps = game.rng.choice(kind.number_steps)
         self.current_steps = 0
-        self.collision_reacting_steps = 30  # Reacting steps when colliding
         self.collision_reaction_counter = 0  # Initialize counter for tracking reaction time after collision
-        
+
         self.moving = False  # Default to not moving
-        
-        # Animation frames for each direction
-        self.animations = {
-            "down": [
-                self.game.enemy_spritesheet.get_image(0, 0, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(32, 0, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(64, 0, self.width, self.height)
-            ],
-            "left": [
-                self.game.enemy_spritesheet.get_image(0, 32, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(32, 32, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(64, 32, self.width, self.height)
-            ],
-            "right": [
-                self.game.enemy_spritesheet.get_image(0, 64, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(32, 64, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(64, 64, self.width, self.height)
-            ],
-            "up": [
-                self.game.enemy_spritesheet.get_image(0, 96, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(32, 96, self.width, self.height),
-                self.game.enemy_spritesheet.get_image(64, 96, self.width, self.height)
-            ]
-        }
+        self.health = kind.health
 
-    def move(self, dt):
-        if self.state == "moving":
-            if self.direction == "left":
-                self.x_change -= ENEMY_STEPS * dt
-            elif self.direction == "right":
-                self.x_change += ENEMY_STEPS * dt
-            elif self.direction == "up":
-                self.y_change -= ENEMY_STEPS * dt
-            elif self.direction == "down":
-                self.y_change += ENEMY_STEPS * dt
-            self.current_steps += 1
-
-        elif self.state == "stalling":
-            self.current_steps += 1
-            if self.current_steps == self.stall_steps:
-                self.state = "moving"
+    def move(self, dt, ticks=1):
+        kind = self.kind
+        state = self.state
+        if state == MOVING:
+            self.steer()
+            direction = self.direction
+            if direction == LEFT:
+                self.x_change -= kind.speed * dt
+            elif direction == RIGHT:
+                self.x_change += kind.speed * dt
+            elif direction == UP:
+                self.y_change -= kind.speed * dt
+            else:
+                self.y_change += kind.speed * dt
+            self.current_steps += ticks
+
+        elif state == STALLING:
+            self.current_steps += ticks
+            if self.current_steps >= kind.stall_steps:
+                self.state = MOVING
                 self.current_steps = 0
-                self.direction = random.choice(['left', 'right', 'up', 'down'])
-                
-        elif self.state == "collision_reacting":
-            self.collision_reaction_counter += 1
-            if self.collision_reaction_counter >= self.collision_reacting_steps:
-                self.state = "moving"  # After reaction, start moving again
+                self.direction = kind.game.rng.choice(range(len(ENEMY_DIRECTIONS)))
+
+        else:  # COLLISION_REACTING
+            self.collision_reaction_counter += ticks
+            if self.collision_reaction_counter >= kind.collision_reacting_steps:
+                self.state = MOVING  # After reaction, start moving again
                 self.current_steps = 0
-                     
-    def update(self, dt):
-        self.moving = self.state == "moving"  # Ensure animation plays when moving
-        
+
+    def update(self, dt, ticks=1, animate=True):
+        """Advances `ticks` ticks at once (dt is their total); the LOD scheduler passes more than one
+        for distant enemies, and animate=False to skip animation they wouldn't show anyway."""
+        kind = self.kind
+        game = kind.game
+        rect = self.rect
+        self.previous_pos = rect.topleft
+        self.updated_tick = game.tick
+        self.moving = self.state == MOVING  # Ensure animation plays when moving
+
         # If the enemy is colliding, stop animation
-        if self.state == "collision_reacting":
+        if self.state == COLLISION_REACTING:
             self.animation_counter = 0  # Stop animation at current frame
-        
-        self.move(dt)
-        self.animation()
 
+        self.move(dt, ticks)
+        if animate:
+            self.animation()
+
+        # A profiler scope per enemy added a quarter to the frame at 10k enemies, so the
+        # time is summed on the kind and reported once per pass (EnemyKind.report_collisions)
+        timed = profiler.enabled
+        if timed:
+            start = time.perf_counter()
         # Step 1: Move and check for collision with blocks (horizontal first)
-        self.rect.x += self.x_change
+        rect.x += self.x_change
         self.collide_block("horizontal")  # Handle collision in the horizontal direction
-        
+
         # Step 2: Move and check for collision with blocks (vertical)
-        self.rect.y += self.y_change
+        rect.y += self.y_change
         self.collide_block("vertical")  # Handle collision in the vertical direction
-        
+        if timed:
+            kind.collide_seconds += time.perf_counter() - start
+            kind.collide_calls += 1
+
         # Step 3: Reset movement after checking collision
         self.x_change = 0
         self.y_change = 0
-        
+
         # If the enemy is moving again, resume animation
-        if self.state != "collision_reacting":
+        if animate and self.state != COLLISION_REACTING:
             self.animation_counter += 1
 
-        if self.current_steps == self.number_steps:
-            if self.state != "stalling":
-                self.current_steps = 0  
-            self.state = "stalling" 
+        if self.current_steps >= self.number_steps:
+            if self.state != STALLING:
+                self.current_steps = 0
+            self.state = STALLING
+
+        game.spatial.move(self)  # Re-register after moving
+
+    def hit(self, damage=1):
+        self.health -= damage
+        if self.health <= 0:
+            self.kill()
+
+    def kill(self):
+        self.kind.game.spatial.remove(self)
+        super().kill()
 
     def animation(self):
+        animation = self.kind.frames[self.direction]
         if self.moving:  # Only animate when moving
-            animation = self.animations[self.direction]
             animation_speed = 0.2  # Control animation speed
 
             self.animation_counter += animation_speed
@@ -323,36 +406,53 @@ class Enemy(pygame.sprite.Sprite):
             self.image = animation[index]
         else:
             self.animation_counter = 0  # Reset animation counter when not moving
-            self.image = self.animations[self.direction][1]  # Keep first frame
-        
+            self.image = animation[1]  # Keep first frame
+
     def collide_block(self, direction):
-        for sprite in self.game.blocks:
-            if self.rect.colliderect(sprite.rect):
-                # On collision, set state to 'collision_reacting' and set direction
-                self.state = "collision_reacting"
-                self.handle_collision(sprite, direction)
-                
-    def handle_collision(self, sprite, direction):
+        rect = self.rect
+        for block in self.kind.game.grid.hits(rect):
+            if rect.colliderect(block):  # An earlier hit may already have pushed us clear
+                # On collision, react and turn away from the block
+                self.state = COLLISION_REACTING
+                self.handle_collision(block, direction)
+
+    def handle_collision(self, block, direction):
         if direction == "horizontal":
             if self.x_change > 0:  # Moving right
-                self.rect.right = sprite.rect.left  # Stop movement to the right
-                self.direction = "left"  # Face left after collision
+                self.rect.right = block.left  # Stop movement to the right
+                self.direction = LEFT  # Face left after collision
             elif self.x_change < 0:  # Moving left
-                self.rect.left = sprite.rect.right  # Stop movement to the left
-                self.direction = "right"  # Face right after collision
+                self.rect.left = block.right  # Stop movement to the left
+                self.direction = RIGHT  # Face right after collision
 
         if direction == "vertical":
             if self.y_change > 0:  # Moving down
-                self.rect.bottom = sprite.rect.top  # Stop movement downward10
-                self.direction = "up"  # Face up after collision
+                self.rect.bottom = block.top  # Stop movement downward
+                self.direction = UP  # Face up after collision
             elif self.y_change < 0:  # Moving up
-                self.rect.top = sprite.rect.bottom  # Stop movement upward
-                self.direction = "down"  # Face down after collision
-                                             
+                self.rect.top = block.bottom  # Stop movement upward
+                self.direction = DOWN  # Face down after collision
+
+    def steer(self):
+        """Turns toward the player along the flow field when it reaches this enemy's tile.
+
+        Turning onto the other axis waits until the enemy is lined up with the
+        tile grid, so it fits through the corridor it turns into."""
+        navigation = self.kind.game.navigation
+        if not navigation:
+            return
+        rect = self.rect
+        wanted = navigation.direction_at(rect.centerx // TILESIZE, rect.centery // TILESIZE)
+        if wanted is None or wanted == self.direction:
+            return
+        horizontal = self.direction <= RIGHT
+        if (wanted <= RIGHT) == horizontal or (rect.x if horizontal else rect.y) % TILESIZE == 0:
+            self.direction = wanted
+
     def change_direction(self):
         # Get the list of all possible directions and remove the current one
-        directions = ['left', 'right', 'up', 'down']
+        directions = list(range(len(ENEMY_DIRECTIONS)))
         directions.remove(self.direction)
-        
+
         # Choose a random direction from the remaining ones
-        self.direction = random.choice(directions)
\ No newline at end of file
+        self.direction = self.kind.game.rng.choice(directions)
@@ -0,0 +1,259 @@
+import random
+import numpy as np
+import pygame
+from settings import *
+from profiler import profiler
+
+# Map characters -> flag bytes, for bytes.translate()
+FLAG_TABLE = bytes(TILE_FLAGS.get(chr(code), 0) for code in range(256))
+
+class TerrainLayer:
+    """Pre-renders static tiles into chunk surfaces so a frame blits a few chunks, not every tile."""
+    def __init__(self, game, cols, rows, tiles, chunk_size=CHUNK_SIZE):
+        self.game = game
+        self.chunk_size = chunk_size  # Chunk size in tiles
+        self.cols = cols
+        self.rows = rows
+        self.tiles = tiles  # bytearray, one byte per tile (the map character), row-major
+
+        # Tile images are cut once and shared by every chunk
+        self.ground_image = game.terrain_spritesheet.get_image(*GROUND_TILE, TILESIZE, TILESIZE)
+        self.tile_images = {
+            ord(tile): game.terrain_spritesheet.get_image(x, y, TILESIZE, TILESIZE)
+            for tile, (x, y) in TILE_IMAGES.items()
+        }
+
+        self.chunks = {}  # (chunk_x, chunk_y) -> rendered Surface
+        self.dirty = set()  # Chunks that need re-rendering before the next draw
+        self.changes = 0  # Bumped whenever tiles change, so cached backgrounds know to refresh
+
+    def get_tile(self, col, row):
+        return chr(self.tiles[row * self.cols + col])
+
+    def set_tile(self, col, row, tile):
+        """Changes a tile and marks only its chunk for re-rendering."""
+        self.tiles[row * self.cols + col] = ord(tile)
+        self.dirty.add((col // self.chunk_size, row // self.chunk_size))
+        self.changes += 1
+
+    def forget_chunk(self, chunk_x, chunk_y):
+        """Drops a chunk's surface after its tiles were replaced wholesale; it re-renders when next drawn."""
+        self.chunks.pop((chunk_x, chunk_y), None)
+        self.dirty.discard((chunk_x, chunk_y))
+        self.changes += 1
+
+    def tile_row(self, row, first_col, cols):
+        """Tile IDs of `cols` tiles of a row, starting at `first_col`."""
+        offset = row * self.cols + first_col
+        return self.tiles[offset:offset + cols]
+
+    def render_chunk(self, chunk_x, chunk_y):
+        size = self.chunk_size
+        first_col, first_row = chunk_x * size, chunk_y * size
+        cols = min(size, self.cols - first_col)
+        rows = min(size, self.rows - first_row)
+
+        surface = pygame.Surface((cols * TILESIZE, rows * TILESIZE)).convert()
+        profiler.count('surfaces allocated')
+        surface.fill(BG_COLOR)  # Shows through the colorkeyed pixels of the tiles
+
+        for row in range(rows):
+            line = self.tile_row(first_row + row, first_col, cols)
+            for col in range(cols):
+                pos = (col * TILESIZE, row * TILESIZE)
+                surface.blit(self.ground_image, pos)  # Ground under every tile
+                image = self.tile_images.get(line[col])
+                if image:
+                    surface.blit(image, pos)
+
+        self.chunks[(chunk_x, chunk_y)] = surface
+        self.dirty.discard((chunk_x, chunk_y))
+        return surface
+
+    def draw(self, screen, view):
+        """Blits the chunks overlapping `view` (a world-space rect) with the view's top-left at (0, 0)."""
+        pixels = self.chunk_size * TILESIZE
+        last_chunk_x = (self.cols - 1) // self.chunk_size
+        last_chunk_y = (self.rows - 1) // self.chunk_size
+        for chunk_y in range(max(view.top // pixels, 0), min((view.bottom - 1) // pixels, last_chunk_y) + 1):
+            for chunk_x in range(max(view.left // pixels, 0), min((view.right - 1) // pixels, last_chunk_x) + 1):
+                key = (chunk_x, chunk_y)
+                surface = self.chunks.get(key)
+                if surface is None or key in self.dirty:
+                    surface = self.render_chunk(chunk_x, chunk_y)
+                screen.blit(surface, (chunk_x * pixels - view.x, chunk_y * pixels - view.y))
+
+class StreamedTerrainLayer(TerrainLayer):
+    """TerrainLayer of a streamed world: tiles are kept only for the chunks the ChunkManager has
+    loaded, so memory follows STREAM_BUDGET, not the map size. Unloaded tiles read as blank (0)."""
+    def __init__(self, game, cols, rows, chunk_size=CHUNK_SIZE):
+        super().__init__(game, cols, rows, None, chunk_size)
+        self.loaded = {}  # (chunk_x, chunk_y) -> chunk_size * chunk_size tile IDs, row-major
+
+    def load_chunk(self, chunk_x, chunk_y, tiles):
+        self.loaded[(chunk_x, chunk_y)] = bytearray(tiles)
+        self.forget_chunk(chunk_x, chunk_y)  # Re-render with the loaded tiles
+
+    def unload_chunk(self, chunk_x, chunk_y):
+        del self.loaded[(chunk_x, chunk_y)]
+        self.forget_chunk(chunk_x, chunk_y)
+
+    def get_tile(self, col, row):
+        size = self.chunk_size
+        tiles = self.loaded.get((col // size, row // size))
+        return chr(tiles[row % size * size + col % size] if tiles is not None else 0)
+
+    def set_tile(self, col, row, tile):
+        """Changes a loaded tile; changes to unloaded chunks are dropped, as they are when a chunk unloads."""
+        size = self.chunk_size
+        tiles = self.loaded.get((col // size, row // size))
+        if tiles is not None:
+            tiles[row % size * size + col % size] = ord(tile)
+            self.dirty.add((col // size, row // size))
+            self.changes += 1
+
+    def tile_row(self, row, first_col, cols):
+        size = self.chunk_size
+        tiles = self.loaded.get((first_col // size, row // size))
+        if tiles is None:
+            return bytes(cols)
+        offset = row % size * size + first_col % size  # Callers stay within one chunk
+        return tiles[offset:offset + cols]
+
+class TileGrid:
+    """Passability grid with one flag byte per tile, so static collision only looks at overlapped tiles."""
+    flag_table = FLAG_TABLE
+
+    def __init__(self, tiles, cols, rows):
+        self.cols = cols
+        self.rows = rows
+        self.flags = bytearray(bytes(tiles).translate(self.flag_table))  # One translate() pass
+
+    def get_flags(self, col, row):
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.flags[row * self.cols + col]
+        return 0  # Outside the map is open, as it was with block sprites
+
+    def set_tile(self, col, row, tile):
+        self.flags[row * self.cols + col] = self.flag_table[ord(tile)]
+
+    def hits(self, rect, mask=TILE_SOLID):
+        """Returns the rects of tiles overlapping `rect` whose flags match `mask`, in row-major order."""
+        first_col = max(rect.left // TILESIZE, 0)
+        last_col = min((rect.right - 1) // TILESIZE, self.cols - 1)
+        first_row = max(rect.top // TILESIZE, 0)
+        last_row = min((rect.bottom - 1) // TILESIZE, self.rows - 1)
+
+        profiler.count('tile tests', (last_row - first_row + 1) * (last_col - first_col + 1))
+        hits = []
+        flags = self.flags
+        for row in range(first_row, last_row + 1):
+            offset = row * self.cols
+            for col in range(first_col, last_col + 1):
+                if flags[offset + col] & mask:
+                    hits.append(pygame.Rect(col * TILESIZE, row * TILESIZE, TILESIZE, TILESIZE))
+        return hits
+
+    def flag_row(self, row, first_col, last_col):
+        """Flags of the tiles of a row from `first_col` up to, not including, `last_col`; all inside the map."""
+        offset = row * self.cols
+        return self.flags[offset + first_col:offset + last_col]
+
+    def flag_window(self, first_col, first_row, cols, rows):
+        """Flags of a cols x rows block of tiles, row-major. Tiles outside the map read as solid."""
+        window = bytearray([TILE_SOLID]) * (cols * rows)
+        start, end = max(first_col, 0), min(first_col + cols, self.cols)
+        if start < end:
+            for row in range(max(first_row, 0), min(first_row + rows, self.rows)):
+                offset = (row - first_row) * cols + start - first_col
+                window[offset:offset + end - start] = self.flag_row(row, start, end)
+        return window
+
+    def flags_at(self, cols, rows):
+        """Flags of many tiles at once, from NumPy arrays of columns and rows; 0 outside the map."""
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        flags = np.frombuffer(self.flags, dtype=np.uint8)
+        return np.where(inside, flags[rows.clip(0, self.rows - 1) * self.cols + cols.clip(0, self.cols - 1)], 0)
+
+class StreamedTileGrid(TileGrid):
+    """TileGrid of a streamed world, with flags only for loaded chunks (see StreamedTerrainLayer).
+    Tiles of unloaded chunks read as solid, so enemies updated near the edge of the loaded
+    area can't walk into walls that aren't there yet; outside the map is open, as in TileGrid."""
+    def __init__(self, cols, rows, chunk_size=CHUNK_SIZE):
+        self.cols = cols
+        self.rows = rows
+        self.chunk_size = chunk_size
+        self.loaded = {}  # (chunk_x, chunk_y) -> chunk_size * chunk_size flag bytes, row-major
+
+    def load_chunk(self, chunk_x, chunk_y, tiles):
+        self.loaded[(chunk_x, chunk_y)] = bytearray(bytes(tiles).translate(self.flag_table))
+
+    def unload_chunk(self, chunk_x, chunk_y):
+        del self.loaded[(chunk_x, chunk_y)]
+
+    def get_flags(self, col, row):
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            size = self.chunk_size
+            flags = self.loaded.get((col // size, row // size))
+            if flags is not None:
+                return flags[row % size * size + col % size]
+            return TILE_SOLID  # Not loaded
+        return 0
+
+    def set_tile(self, col, row, tile):
+        size = self.chunk_size
+        flags = self.loaded.get((col // size, row // size))
+        if flags is not None:
+            flags[row % size * size + col % size] = self.flag_table[ord(tile)]
+
+    def hits(self, rect, mask=TILE_SOLID):
+        first_col = max(rect.left // TILESIZE, 0)
+        last_col = min((rect.right - 1) // TILESIZE, self.cols - 1)
+        first_row = max(rect.top // TILESIZE, 0)
+        last_row = min((rect.bottom - 1) // TILESIZE, self.rows - 1)
+
+        profiler.count('tile tests', (last_row - first_row + 1) * (last_col - first_col + 1))
+        return [
+            pygame.Rect(col * TILESIZE, row * TILESIZE, TILESIZE, TILESIZE)
+            for row in range(first_row, last_row + 1) for col in range(first_col, last_col + 1)
+            if self.get_flags(col, row) & mask
+        ]
+
+    def flag_row(self, row, first_col, last_col):
+        return bytes(self.get_flags(col, row) for col in range(first_col, last_col))
+
+    def flags_at(self, cols, rows):
+        inside = (cols >= 0) & (cols < self.cols) & (rows >= 0) & (rows < self.rows)
+        flags = np.where(inside, TILE_SOLID, 0).astype(np.uint8)  # Loaded chunks overwrite theirs below
+        size = self.chunk_size
+        chunk_cols, chunk_rows = cols // size, rows // size
+        for key in set(zip(chunk_cols[inside].tolist(), chunk_rows[inside].tolist())):  # Few: shots stay near the player
+            chunk = self.loaded.get(key)
+            if chunk is not None:
+                here = inside & (chunk_cols == key[0]) & (chunk_rows == key[1])
+                flags[here] = np.frombuffer(chunk, dtype=np.uint8)[rows[here] % size * size + cols[here] % size]
+        return flags
+
+def generate_world_map(cols, rows, enemies, seed=None, wall_density=0.05):
+    """Builds a random map in the WORLD_MAP format: walled border, scattered blocks, rocks and
+    water, the player in the middle and `enemies` enemies on free tiles."""
+    rng = random.Random(seed)
+    grid = [['.'] * cols for _ in range(rows)]
+    for row in range(rows):
+        for col in range(cols):
+            if row in (0, rows - 1) or col in (0, cols - 1):
+                grid[row][col] = 'B'
+            else:
+                roll = rng.random()
+                if roll < wall_density:
+                    grid[row][col] = 'B'
+                elif roll < wall_density * 1.5:
+                    grid[row][col] = rng.choice('RW')
+
+    grid[rows // 2][cols // 2] = 'P'
+    free = [(col, row) for row in range(1, rows - 1) for col in range(1, cols - 1) if grid[row][col] == '.']
+    if enemies > len(free):
+        raise ValueError(f"{cols}x{rows} map has room for {len(free)} enemies, not {enemies}")
+    for col, row in rng.sample(free, enemies):
+        grid[row][col] = 'E'
+    return [''.join(row) for row in grid]
@@ -0,0 +1,173 @@
+from collections import Counter
+import numpy as np
+import pygame
+from settings import *
+
+class ProjectilePool:
+    """Fixed-capacity projectile store: positions, velocities and lifetimes in preallocated arrays.
+
+    Firing takes a slot from a free list and dying gives it back, so bursts of
+    thousands of shots create no objects. Each tick moves every live
+    projectile and resolves lifetimes, wall hits and enemy hits in one
+    batched pass. Positions are projectile centres in world pixels."""
+    def __init__(self, game, capacity=PROJECTILE_CAPACITY):
+        self.game = game
+        self.capacity = capacity
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)  # Pixels per tick; zero for free slots so moving them is a no-op
+        self.vy = np.zeros(capacity)
+        self.life = np.zeros(capacity, dtype=np.int32)  # Ticks left
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int32)  # Stack of free slots, next one last
+        self.free_count = capacity
+
+        self.image = game.bullet_spritesheet.get_image(0, 0, TILESIZE, TILESIZE)
+
+    def __len__(self):
+        return self.capacity - self.free_count
+
+    def take(self, count):
+        """Pops up to `count` free slots; returns them as an array view."""
+        count = min(count, self.free_count)
+        self.free_count -= count
+        return self.free[self.free_count:self.free_count + count]
+
+    def spawn(self, x, y, vx, vy, life=PROJECTILE_LIFETIME):
+        """Fires one projectile; returns False (and fires nothing) when the pool is full."""
+        slots = self.take(1)
+        if not len(slots):
+            return False
+        slot = slots[0]
+        self.x[slot], self.y[slot] = x, y
+        self.vx[slot], self.vy[slot] = vx, vy
+        self.life[slot] = life
+        self.alive[slot] = True
+        return True
+
+    def burst(self, x, y, count, speed=BULLET_STEPS, life=PROJECTILE_LIFETIME):
+        """Fires up to `count` projectiles outward in a ring at once; returns how many were fired."""
+        slots = self.take(count)
+        angles = np.arange(len(slots)) * (2 * np.pi / max(len(slots), 1))
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vx[slots] = np.cos(angles) * speed
+        self.vy[slots] = np.sin(angles) * speed
+        self.life[slots] = life
+        self.alive[slots] = True
+        return len(slots)
+
+    def release(self, slots):
+        self.alive[slots] = False
+        self.vx[slots] = 0
+        self.vy[slots] = 0
+        self.free[self.free_count:self.free_count + len(slots)] = slots
+        self.free_count += len(slots)
+
+    def update(self):
+        if self.free_count == self.capacity:
+            return
+        alive = self.alive
+        self.x += self.vx
+        self.y += self.vy
+        self.life -= alive
+
+        # Expired, off the map, or inside a wall
+        grid = self.game.grid
+        col = (self.x // TILESIZE).astype(np.int32)
+        row = (self.y // TILESIZE).astype(np.int32)
+        inside = (col >= 0) & (col < grid.cols) & (row >= 0) & (row < grid.rows)
+        in_wall = (grid.flags_at(col, row) & TILE_SOLID).astype(bool)
+        dead = alive & ((self.life <= 0) | ~inside | in_wall)
+
+        flying = np.flatnonzero(alive & ~dead)
+        if len(flying):
+            dead[self.hit_enemies(flying)] = True
+        self.release(np.flatnonzero(dead))
+
+    def hit_enemies(self, slots):
+        """Damages the first enemy each projectile in `slots` overlaps; returns the slots that hit."""
+        game = self.game
+        if game.enemy_system:
+            targets = game.enemy_system.hit_test(self.x[slots], self.y[slots], PROJECTILE_SIZE // 2)
+            hit = targets >= 0
+            game.enemy_system.damage(targets[hit])
+            return slots[hit]
+
+        targets = self.hit_test(self.x[slots], self.y[slots], PROJECTILE_SIZE // 2)
+        hit = [target for target in targets if target is not None]
+        for enemy, count in Counter(hit).items():  # Repeats stack, as with EnemySystem.damage
+            enemy.hit(count)
+        return slots[[target is not None for target in targets]]
+
+    def hit_test(self, px, py, half):
+        """The sprite enemy (lowest spawn order) overlapped by each square of half-size `half`
+        centred on (px, py), or None; the same test as EnemySystem.hit_test.
+
+        Projectiles are bucketed by the spatial-hash cell of their centre, and each
+        occupied cell tests all its projectiles at once against the enemies the hash
+        has around it, so the cost follows the occupied cells, not the projectiles."""
+        game = self.game
+        has = game.enemies.has_internal
+        size = game.spatial.cell_size
+        targets = [None] * len(px)
+        if not len(px):
+            return targets
+
+        cols = (px // size).astype(np.int64)
+        rows = (py // size).astype(np.int64)
+        keys = rows * (1 << 32) + cols
+        cells, first, members_of = np.unique(keys, return_index=True, return_inverse=True)
+        order = np.argsort(members_of, kind='stable')
+        bounds = np.searchsorted(members_of[order], np.arange(len(cells) + 1))
+        margin = half + 1
+        for cell in range(len(cells)):
+            # Any square centred in this cell lies within the cell grown by `half`
+            col, row = int(cols[first[cell]]), int(rows[first[cell]])
+            area = pygame.Rect(col * size - margin, row * size - margin, size + 2 * margin, size + 2 * margin)
+            enemies = [enemy for enemy in game.spatial.candidates(area) if has(enemy)]
+            if not enemies:
+                continue
+            members = order[bounds[cell]:bounds[cell + 1]]
+            ex, ey, ew, eh, spawned = np.array(
+                [(enemy.rect.x, enemy.rect.y, enemy.rect.width, enemy.rect.height, enemy.spawn_order) for enemy in enemies],
+                dtype=np.float64).T
+            left = px[members, None] - half
+            top = py[members, None] - half
+            overlap = (ex < left + 2 * half) & (left < ex + ew) & (ey < top + 2 * half) & (top < ey + eh)
+            best = np.where(overlap, spawned, np.inf).argmin(axis=1)
+            for member, enemy, found in zip(members.tolist(), best.tolist(), overlap[np.arange(len(members)), best].tolist()):
+                if found:
+                    targets[member] = enemies[enemy]
+        return targets
+
+    def visible(self, view, alpha=1.0):
+        """(key, image, screen rect) for each projectile in the world-space `view` rect,
+        drawn `alpha` of the way from its previous tick's position to its current one."""
+        if self.free_count == self.capacity:
+            return []
+        x = self.x - self.vx * (1 - alpha)
+        y = self.y - self.vy * (1 - alpha)
+        half = TILESIZE // 2
+        shown = np.flatnonzero(self.alive & (x > view.left - half) & (x < view.right + half) & (y > view.top - half) & (y < view.bottom + half))
+        return [
+            (('projectile', slot), self.image, pygame.Rect(int(x[slot]) - half - view.x, int(y[slot]) - half - view.y, TILESIZE, TILESIZE))
+            for slot in shown
+        ]
+
+class Weapon:
+    """A gun that fires single shots from the shared projectile pool, limited by a cooldown."""
+    def __init__(self, game, cooldown=WEAPON_COOLDOWN, speed=BULLET_STEPS):
+        self.game = game
+        self.cooldown = cooldown  # Ticks between shots
+        self.speed = speed
+        self.ready_in = 0
+
+    def update(self, firing, origin, direction):
+        """Called once per tick; fires from `origin` toward the direction name when `firing`."""
+        if self.ready_in:
+            self.ready_in -= 1  # Counts down first, so shots are exactly `cooldown` ticks apart
+        if firing and not self.ready_in:
+            step_x, step_y = DIRECTION_VECTORS[direction]
+            if self.game.projectiles.spawn(origin[0], origin[1], step_x * self.speed, step_y * self.speed):
+                self.ready_in = self.cooldown
@@ -0,0 +1,168 @@
+"""Streaming chunked world format.
+
+A world file stores the map as tile IDs (the map characters as bytes) in
+fixed-size square chunks, so the game can memory-map it and bring in only
+the chunks around the player:
+
+    header   magic, version, chunk size, map size in tiles, player spawn tile
+    index    one (offset, enemy count) entry per chunk, row-major
+    chunks   chunk_size * chunk_size tile IDs each, row-major, edge chunks padded with 0
+
+Convert the built-in map (or a generated one) with
+
+    python world.py world.rpgw
+    python world.py big.rpgw --generate 4096 4096 --enemies 20000
+"""
+import argparse, mmap, struct
+from collections import OrderedDict
+from settings import *
+from sprites import Enemy
+
+MAGIC = b'RPGW'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIII')  # magic, version, chunk size, cols, rows, player col, player row
+INDEX_ENTRY = struct.Struct('<QI')  # chunk offset, enemies in the chunk
+
+def write_world(path, world_map, chunk_size=CHUNK_SIZE):
+    """Converts a WORLD_MAP-style list of strings into a world file."""
+    rows, cols = len(world_map), len(world_map[0])
+    chunks_x = (cols + chunk_size - 1) // chunk_size
+    chunks_y = (rows + chunk_size - 1) // chunk_size
+
+    player = next(((row.index('P'), i) for i, row in enumerate(world_map) if 'P' in row), (cols // 2, rows // 2))
+    data_start = HEADER.size + INDEX_ENTRY.size * chunks_x * chunks_y
+
+    index = bytearray()
+    chunks = bytearray()
+    for chunk_y in range(chunks_y):
+        for chunk_x in range(chunks_x):
+            chunk = bytearray(chunk_size * chunk_size)
+            first_col = chunk_x * chunk_size
+            for row in range(min(chunk_size, rows - chunk_y * chunk_size)):
+                line = world_map[chunk_y * chunk_size + row][first_col:first_col + chunk_size].encode('ascii')
+                chunk[row * chunk_size:row * chunk_size + len(line)] = line
+            index += INDEX_ENTRY.pack(data_start + len(chunks), chunk.count(b'E'))
+            chunks += chunk
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, chunk_size, cols, rows, *player))
+        f.write(index)
+        f.write(chunks)
+
+class WorldFile:
+    """Read-only, memory-mapped view of a world file; chunks are read on demand without copying."""
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.chunk_size, self.cols, self.rows, *self.player_spawn = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a world file")
+        if version != VERSION:
+            raise ValueError(f"{path} is world format version {version}, expected {VERSION}")
+        self.chunks_x = (self.cols + self.chunk_size - 1) // self.chunk_size
+        self.chunks_y = (self.rows + self.chunk_size - 1) // self.chunk_size
+
+    def chunk(self, chunk_x, chunk_y):
+        """Tile IDs of a chunk as a memoryview, chunk_size * chunk_size bytes row-major."""
+        offset, _ = INDEX_ENTRY.unpack_from(self.data, HEADER.size + INDEX_ENTRY.size * (chunk_y * self.chunks_x + chunk_x))
+        return memoryview(self.data)[offset:offset + self.chunk_size * self.chunk_size]
+
+    def enemy_count(self, chunk_x, chunk_y):
+        return INDEX_ENTRY.unpack_from(self.data, HEADER.size + INDEX_ENTRY.size * (chunk_y * self.chunks_x + chunk_x))[1]
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+class ChunkManager:
+    """Loads world chunks (tiles, walls and their enemies) near the player and evicts far ones.
+
+    Chunks within STREAM_RADIUS chunks of the player are kept loaded. Others
+    stay loaded as a cache until more than STREAM_BUDGET chunks are resident,
+    then the least recently used are evicted. The terrain layer and tile grid
+    hold tiles only for loaded chunks, so memory is bounded by the budget, not
+    the map size. An evicted chunk's tiles, walls and terrain surface are freed
+    and the enemies it spawned are removed; they respawn from the file when
+    the chunk loads again."""
+    def __init__(self, game, world, radius=STREAM_RADIUS, budget=STREAM_BUDGET):
+        if world.chunk_size != game.terrain.chunk_size:
+            raise ValueError(f"world chunk size {world.chunk_size} does not match CHUNK_SIZE {game.terrain.chunk_size}")
+        self.game = game
+        self.world = world
+        self.radius = radius
+        self.budget = max(budget, (2 * radius + 1) ** 2)  # Never evict chunks that are in range
+        self.loaded = OrderedDict()  # (chunk_x, chunk_y) -> enemies spawned by the chunk, oldest use first
+        self.center = None
+
+    def update(self, rect):
+        """Makes sure the chunks around `rect` (the player's) are loaded; cheap while it stays in one chunk."""
+        pixels = self.world.chunk_size * TILESIZE
+        center = (rect.centerx // pixels, rect.centery // pixels)
+        if center == self.center:
+            return
+        self.center = center
+
+        center_x, center_y = center
+        for chunk_y in range(max(center_y - self.radius, 0), min(center_y + self.radius, self.world.chunks_y - 1) + 1):
+            for chunk_x in range(max(center_x - self.radius, 0), min(center_x + self.radius, self.world.chunks_x - 1) + 1):
+                key = (chunk_x, chunk_y)
+                if key in self.loaded:
+                    self.loaded.move_to_end(key)
+                else:
+                    self.load(chunk_x, chunk_y)
+
+        while len(self.loaded) > self.budget:
+            self.unload(*next(iter(self.loaded)))
+
+    def load(self, chunk_x, chunk_y):
+        game, world = self.game, self.world
+        size = world.chunk_size
+        data = world.chunk(chunk_x, chunk_y)
+        first_col, first_row = chunk_x * size, chunk_y * size
+        cols = min(size, world.cols - first_col)
+        rows = min(size, world.rows - first_row)
+
+        game.terrain.load_chunk(chunk_x, chunk_y, data)
+        game.grid.load_chunk(chunk_x, chunk_y, data)
+
+        enemies = []
+        for row in range(rows):
+            line = bytes(data[row * size:row * size + cols])
+            col = line.find(b'E')
+            while col != -1:
+                enemy = Enemy(game, first_col + col, first_row + row)
+                game.enemies.add(enemy)
+                enemies.append(enemy)
+                col = line.find(b'E', col + 1)
+
+        if game.navigation:
+            game.navigation.invalidate()
+        self.loaded[(chunk_x, chunk_y)] = enemies
+
+    def unload(self, chunk_x, chunk_y):
+        game = self.game
+        for enemy in self.loaded.pop((chunk_x, chunk_y)):
+            enemy.kill()
+        game.terrain.unload_chunk(chunk_x, chunk_y)  # Its tiles go back to blank
+        game.grid.unload_chunk(chunk_x, chunk_y)
+        if game.navigation:
+            game.navigation.invalidate()
+
+def main():
+    from tilemap import generate_world_map
+
+    parser = argparse.ArgumentParser(description="Convert a map to the streaming world format.")
+    parser.add_argument('output')
+    parser.add_argument('--generate', nargs=2, type=int, metavar=('COLS', 'ROWS'), help="generate a random map instead of WORLD_MAP")
+    parser.add_argument('--enemies', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    world_map = WORLD_MAP
+    if args.generate:
+        world_map = generate_world_map(*args.generate, args.enemies, args.seed)
+    write_world(args.output, world_map)
+
+if __name__ == "__main__":
+    main()